@@ -1,5 +1,8 @@
 from __future__ import absolute_import
-from collections import defaultdict
+from collections import defaultdict, namedtuple
+import datetime
+from decimal import Decimal
+from itertools import chain
 import warnings
 import weakref
 
@@ -8,25 +11,142 @@ import sqlalchemy as sa
 import sqlalchemy.orm as saorm
 
 from savalidation._internal import getversion
+from savalidation.validators import FEVMeta
 import six
 
 VERSION = getversion()
 
 
+# one invalid instance of a ValidationError: the name of its class, its primary key (None
+# values for autoincrementing keys of new instances) and its errors by field name
+InvalidInstance = namedtuple('InvalidInstance', 'model identity errors')
+
+
+def _identity(instance):
+    state = sa.inspect(instance)
+    return state.identity or tuple(state.mapper.primary_key_from_instance(instance))
+
+
+def _describe(description, errors):
+    fields_with_errors = []
+    for fname, field_errors in six.iteritems(errors):
+        fields_with_errors.append('[%s: "%s"]' % (fname, '"; "'.join(field_errors)))
+    return '%s %s' % (description, '; '.join(fields_with_errors))
+
+
 class ValidationError(Exception):
-    """ issued when models are flushed but have validation errors """
-    def __init__(self, invalid_instances):
-        self.invalid_instances = invalid_instances
-        instance_errors = []
-        for instance in invalid_instances:
-            fields_with_errors = []
-            fields = instance._sav.errors
-            model = str(instance)
-            for fname, errors in six.iteritems(fields):
-                fields_with_errors.append('[%s: "%s"]' % (fname, '"; "'.join(errors)))
-            instance_errors.append('%s %s' % (model, '; '.join(fields_with_errors)))
-        msg = 'validation error(s): %s' % '; '.join(instance_errors)
-        Exception.__init__(self, msg)
+    """
+        issued when models are flushed but have validation errors, truncated is True when
+        validation stopped before all the instances were validated (see
+        ValidationMixin._sav_max_errors)
+
+        The message is only put together when it's first needed and describes at most
+        max_shown instances.  The errors property gives the errors of all of them.  With
+        keep_instances=False only their InvalidInstance records are kept and
+        invalid_instances is None.  Flushes take both options from session.info's
+        'sav_error_max_shown' and 'sav_error_keep_instances' when set.
+    """
+    # how many invalid instances the message describes, None for all of them
+    max_shown = 20
+    keep_instances = True
+
+    def __init__(self, invalid_instances, truncated=False, **kwargs):
+        self.truncated = truncated
+        self.max_shown = kwargs.pop('max_shown', self.max_shown)
+        keep_instances = kwargs.pop('keep_instances', self.keep_instances)
+        if kwargs:
+            raise TypeError('unexpected keyword argument(s): %s' % ', '.join(sorted(kwargs)))
+        self.instance_count = len(invalid_instances)
+        error_dicts = self._instance_errors(invalid_instances)
+        if keep_instances:
+            self.invalid_instances = invalid_instances
+            self._error_dicts = error_dicts
+            self._errors = None
+        else:
+            self.invalid_instances = None
+            self._errors = [
+                InvalidInstance(type(instance).__name__, _identity(instance), dict(errors))
+                for instance, errors in zip(invalid_instances, error_dicts)
+            ]
+        self._message = None
+        Exception.__init__(self)
+
+    @property
+    def args(self):
+        # the message is only put together when it's needed, not given to Exception.__init__()
+        return (str(self),)
+
+    @args.setter
+    def args(self, args):
+        self._message = str(args[0]) if args else ''
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, str(self))
+
+    def _instance_errors(self, invalid_instances):
+        # the error dicts are taken now, later validation replaces rather than changes them
+        return [instance._sav._errors or {} for instance in invalid_instances]
+
+    @property
+    def errors(self):
+        """ a list with an InvalidInstance for each invalid instance """
+        if self._errors is None:
+            self._errors = [
+                InvalidInstance(type(instance).__name__, _identity(instance), dict(errors))
+                for instance, errors in zip(self.invalid_instances, self._error_dicts)
+            ]
+        return self._errors
+
+    def _descriptions(self, count):
+        """ yields (description, errors) for the first `count` invalid instances """
+        if self.invalid_instances is None:
+            for invalid in self._errors[:count]:
+                yield '<%s identity=%r>' % (invalid.model, invalid.identity), invalid.errors
+        else:
+            for index in range(count):
+                yield str(self.invalid_instances[index]), self._error_dicts[index]
+
+    def __str__(self):
+        if self._message is None:
+            shown = self.instance_count
+            if self.max_shown is not None:
+                shown = min(shown, self.max_shown)
+            msg = 'validation error(s): %s' % '; '.join(
+                _describe(description, errors)
+                for description, errors in self._descriptions(shown)
+            )
+            if shown < self.instance_count:
+                msg += '; ... and %s more' % (self.instance_count - shown)
+            if self.truncated:
+                msg += ' (validation stopped after %s invalid instance(s))' % self.instance_count
+            self._message = msg
+        return self._message
+
+
+class BulkValidationError(ValidationError):
+    """
+        issued when the objects or mappings given to a bulk operation have validation errors,
+        row_errors maps the index of each invalid row to its errors
+    """
+    def __init__(self, row_errors, rows):
+        self.row_errors = row_errors
+        ValidationError.__init__(self, [rows[index] for index in sorted(row_errors)])
+
+    def _instance_errors(self, invalid_instances):
+        return [self.row_errors[index] for index in sorted(self.row_errors)]
+
+    @property
+    def errors(self):
+        """ a list with an InvalidInstance for each invalid row, its identity is the index """
+        return [
+            InvalidInstance(type(self.invalid_instances[position]).__name__, index,
+                            dict(self.row_errors[index]))
+            for position, index in enumerate(sorted(self.row_errors))
+        ]
+
+    def _descriptions(self, count):
+        for index in sorted(self.row_errors)[:count]:
+            yield 'row %s' % index, self.row_errors[index]
 
 
 class EntityRefMissing(Exception):
@@ -46,8 +166,254 @@ class EntityRefMissing(Exception):
 
 
 class _FEState(object):
+    # formencode's Schema and ForEach validators set full_dict, full_list and index
+    __slots__ = ('entity', 'key', '_full_dict', 'full_list', 'index', 'plan_source')
+
     def __init__(self, entity):
         self.entity = entity
+        self.key = None
+        self._full_dict = None
+        # (source, get_value, entries) of the plan being applied, set by _apply_plan()
+        self.plan_source = None
+
+    @property
+    def full_dict(self):
+        """
+            the values of the fields being validated, as formencode.Schema sets it, only read
+            from the source once a validator asks for them
+        """
+        if self._full_dict is None and self.plan_source is not None:
+            source, get_value, entries = self.plan_source
+            self._full_dict = dict((entry.key, get_value(source, entry.key, None))
+                                   for entry in entries)
+        return self._full_dict
+
+    @full_dict.setter
+    def full_dict(self, value):
+        self._full_dict = value
+
+
+# types of column values that can be ruled out as iterators without trying to iterate them,
+# and which can't change in place
+_SCALAR_TYPES = frozenset(six.integer_types + six.string_types + (
+    six.text_type, bool, float, bytes, type(None), Decimal, datetime.date, datetime.datetime,
+    datetime.time,
+))
+
+
+def _value_is_iterator(value):
+    """ same test as formencode.Schema._value_is_iterator() with a fast path for scalars """
+    if type(value) in _SCALAR_TYPES or isinstance(value, (six.binary_type, six.text_type)):
+        return False
+    if isinstance(value, (list, tuple)):
+        return True
+    try:
+        iter(value)
+        return True
+    except TypeError:
+        return False
+
+
+_PlanEntry = namedtuple('_PlanEntry', 'key validators event is_converter accept_iterator')
+
+
+def _apply_plan(source, get_value, entries, flag_convert, state, field_names=None):
+    """
+        Runs compiled plan entries against the values of `source`, read with
+        get_value(source, key, None); getattr for entities, dict.get for mappings.
+
+        Returns a list of (field name, error message) tuples, or None when everything
+        validated, and the converted values when flag_convert is set.
+    """
+    failures = None
+    converted = {} if flag_convert else None
+    state.plan_source = (source, get_value, entries)
+    state.full_dict = None
+    for key, validators, event, is_converter, accept_iterator in entries:
+        if field_names is not None and key not in field_names:
+            continue
+        value = get_value(source, key, None)
+        # formencode.Schema does not allow multiple values for a field unless all the
+        # validators accept them.  The error is replaced by a validator's error if there
+        # is one.
+        error_msg = None
+        if not accept_iterator and _value_is_iterator(value):
+            error_msg = formencode.Schema().message('singleValueExpected', state)
+        state.key = key
+        try:
+            for validator in validators:
+                value = validator(value, state)
+        except formencode.Invalid as e:
+            error_msg = e.unpack_errors()
+        if error_msg is not None:
+            if failures is None:
+                failures = []
+            failures.append((key, error_msg))
+        elif flag_convert:
+            converted[key] = value
+    return failures, converted
+
+
+def _apply_event_plans(entity, plans, state, field_names=None):
+    """
+        Applies the (validation entries, conversion entries) plans of events to an entity in
+        turn, like _ValidationHelper.run_plan() but without needing the entity's helper.
+        Returns the list of (field name, error message) tuples.
+    """
+    failures = []
+    for val_entries, conv_entries in plans:
+        val_failures, _ = _apply_plan(entity, getattr, val_entries, False, state, field_names)
+        conv_failures, converted = _apply_plan(entity, getattr, conv_entries, True, state,
+                                               field_names)
+        if val_failures:
+            failures.extend(val_failures)
+        if conv_failures:
+            failures.extend(conv_failures)
+        elif converted:
+            entity.__dict__.update(converted)
+    return failures
+
+
+_ColumnInfo = namedtuple('_ColumnInfo', 'key column nullable has_default primary_key foreign_keys')
+
+
+def _validate_snapshots(ent_cls, snapshots, event='before_flush'):
+    """
+        Validates copies of entity values, as made by _EventHandler.validate_with_executor(),
+        so it can run in a worker thread or process.  Validators see the snapshot dict as
+        state.entity.  Returns a (failures, converted values) tuple for each snapshot.
+    """
+    if not hasattr(ent_cls, '_sav_event_plans'):
+        # a fresh worker process
+        saorm.configure_mappers()
+    val_entries, conv_entries = ent_cls._sav_event_plans[event]
+    results = []
+    for snapshot in snapshots:
+        state = _FEState(snapshot)
+        failures, _ = _apply_plan(snapshot, dict.get, val_entries, False, state, snapshot)
+        conv_failures, converted = _apply_plan(snapshot, dict.get, conv_entries, True, state,
+                                               snapshot)
+        if conv_failures:
+            failures = (failures or []) + conv_failures
+            converted = None
+        results.append((failures, converted))
+    return results
+
+
+class _ClassMetadata(object):
+    """
+        The mapper introspection validation needs, done once per mapper instead of every
+        time a validator or an instance asks for it.
+    """
+    def __init__(self, mapper, plan=()):
+        self.mapper = mapper
+        column_names = []
+        self.columns = {}
+        for prop in mapper.iterate_properties:
+            if not isinstance(prop, saorm.ColumnProperty):
+                continue
+            col = prop.columns[0]
+            column_names.append(prop.key)
+            # column_property() expressions don't have all the attributes a Column does
+            self.columns[prop.key] = _ColumnInfo(
+                prop.key,
+                col,
+                getattr(col, 'nullable', True),
+                bool(getattr(col, 'default', None) or getattr(col, 'server_default', None)),
+                getattr(col, 'primary_key', False),
+                bool(getattr(col, 'foreign_keys', None)),
+            )
+        self.column_names = tuple(column_names)
+        self.set_plan(plan)
+
+    def set_plan(self, plan):
+        # the names of the fields validated for each event
+        self.event_fields = {}
+        for event in FEVMeta.ALL_EVENTS:
+            self.event_fields[event] = frozenset(e.key for e in plan if e.event == event)
+
+    def needs_not_empty(self, colname):
+        info = self.columns[colname]
+        return not info.nullable and not info.has_default
+
+
+# the _FlushContext of each session's flush, by Session.hash_key, which is what the states of
+# its instances have as session_id.  The session keeps the context alive while it flushes.
+_flush_contexts = weakref.WeakValueDictionary()
+
+
+class _FlushContext(object):
+    """
+        Tracks a session's flush: how many validated entities are left to be executed and the
+        ones found to be invalid so far, so raising at the end doesn't need to look at all of
+        them again.
+    """
+    __slots__ = ('session_id', 'remaining', 'invalid', 'session_limit', 'max_errors',
+                 'session_info', '__weakref__')
+
+    def __init__(self, session, remaining):
+        self.session_id = session.hash_key
+        self.remaining = remaining
+        self.session_info = session_info = session.info
+        self.invalid = []
+        # the session's limit on invalid instances, if it has one, applies to all classes
+        self.session_limit = 'sav_fail_fast' in session_info or 'sav_max_errors' in session_info
+        if session_info.get('sav_fail_fast'):
+            self.max_errors = 1
+        else:
+            self.max_errors = session_info.get('sav_max_errors')
+        _flush_contexts[self.session_id] = self
+
+    def error(self, truncated=False):
+        """ the ValidationError for the invalid entities, with the session's options """
+        options = {}
+        for option in ('max_shown', 'keep_instances'):
+            key = 'sav_error_' + option
+            if key in self.session_info:
+                options[option] = self.session_info[key]
+        return ValidationError(self.invalid, truncated, **options)
+
+    def add_invalid(self, ent):
+        """
+            Records an invalid entity found before the flush executes and raises once the limit
+            is reached.  The before_exec validation is still to come, so that always truncates.
+        """
+        self.invalid.append(ent)
+        if self.limit_reached(ent):
+            raise self.error(truncated=True)
+
+    def limit_reached(self, ent):
+        """ True when `ent`, an invalid entity, means validation of the flush should stop """
+        if self.session_limit:
+            max_errors = self.max_errors
+        else:
+            max_errors = 1 if ent._sav_fail_fast else ent._sav_max_errors
+        return max_errors is not None and len(self.invalid) >= max_errors
+
+    def finish(self):
+        if _flush_contexts.get(self.session_id) is self:
+            del _flush_contexts[self.session_id]
+
+
+def _dirty_field_names(entity):
+    """
+        Returns the names of the columns that need validating when the entity is only
+        validated for the fields that changed, or None when all fields should be validated.
+
+        New instances are always fully validated.  For persistent instances, the
+        attribute history SA keeps for the unit of work tells us what changed and
+        fields which declared a dependency on a changed column are added in.
+    """
+    if not entity._sav_validate_dirty_only:
+        return None
+    state = saorm.attributes.instance_state(entity)
+    if state.key is None:
+        return None
+    changed = set(state.committed_state)
+    dependents = entity._sav_dirty_dependents
+    for colname in list(changed):
+        changed.update(dependents.get(colname, ()))
+    return changed
 
 
 class _ValidationHelper(object):
@@ -56,11 +422,18 @@ class _ValidationHelper(object):
         variables and use methods without concerning ourselves with clashing
         with the Entity's variables and methods.
     """
+    # validated entities can number in the hundreds of thousands in a session, keep this small
+    __slots__ = ('entref', '_errors', 'fingerprint', 'assigned')
+
     def __init__(self, entity):
-        self.clear_errors()
         self.entref = weakref.ref(entity)
-        self.field_validators = defaultdict(list)
-        self.chained_validators = []
+        # only allocated once there is an error, see the errors property
+        self._errors = None
+        # the values last validated without errors, see ValidationMixin._sav_skip_unchanged
+        self.fingerprint = None
+        # field name -> error messages of the values validated as they were assigned since
+        # the last flush, see ValidationMixin._sav_validate_on_set
+        self.assigned = None
 
     @property
     def entity(self):
@@ -75,20 +448,17 @@ class _ValidationHelper(object):
             need to do some hoop jumping so that this object can be pickled
             without the weakref getting in the way
         """
-        state = dict(self.__dict__)
-        state['entity'] = self.entity
-        del state['entref']
-        return state
+        return {'entity': self.entity, 'errors': self._errors}
 
     def __setstate__(self, state):
         """
             complement's __getstate__ so that we can re-enstantiate the object
         """
-        entity = state['entity']
-
-        del state['entity']
-        self.__dict__ = state
-        self.entref = weakref.ref(entity)
+        self.entref = weakref.ref(state['entity'])
+        # pickles from before the helper had slots have extra keys, they are ignored
+        self._errors = state.get('errors') or None
+        self.fingerprint = None
+        self.assigned = None
 
     @property
     def entity_linkers(self):
@@ -103,46 +473,348 @@ class _ValidationHelper(object):
             method_obj = getattr(self.entity, mname)
             method_obj()
 
+    @property
+    def errors(self):
+        if self._errors is None:
+            self._errors = defaultdict(list)
+        return self._errors
+
+    @property
+    def has_errors(self):
+        return bool(self._errors)
+
     def clear_errors(self):
-        self.errors = defaultdict(list)
+        self._errors = None
 
     def add_error(self, field_name, msg):
         self.errors[field_name].append(msg)
 
-    def validate_fe_schema(self, schema, flag_convert):
-        if not schema.fields:
-            return
-        idict = {}
-        for colname in self.entity._sav_column_names():
-            if colname in schema.fields:
-                idict[colname] = getattr(self.entity, colname, None)
-        try:
-            processed = schema.to_python(idict, _FEState(self.entity))
-            if flag_convert:
-                self.entity.__dict__.update(processed)
-        except formencode.Invalid as e:
-            for field_name, msg in six.iteritems(e.unpack_errors()):
-                self.add_error(field_name, msg)
+    def dirty_field_names(self):
+        return _dirty_field_names(self.entity)
+
+    def fingerprint_values(self):
+        """
+            The values of the fields validated before flush followed by their types, so 1, 1.0
+            and True don't match, or None when one of them is not a scalar, which could change
+            in place.
+        """
+        entity = self.entity
+        event_fields = entity._sav_class_metadata().event_fields['before_flush']
+        values = tuple(getattr(entity, key, None) for key in event_fields)
+        types = tuple(type(value) for value in values)
+        if not _SCALAR_TYPES.issuperset(types):
+            return None
+        return values + types
+
+    def validate_if_changed(self):
+        """
+            before_flush validation for classes with _sav_skip_unchanged set: the validators are
+            only run when the values changed since they last validated without errors.
+        """
+        entity = self.entity
+        if not entity._sav_skip_runs_before_flush and not self.has_errors:
+            fingerprint = self.fingerprint_values()
+            if fingerprint is not None and fingerprint == self.fingerprint:
+                return False
+        self.clear_errors()
+        self.trigger_before_flush_methods()
+        if not self.has_errors:
+            fingerprint = self.fingerprint_values()
+            if fingerprint is not None and fingerprint == self.fingerprint:
+                return False
+        has_error = self.run_event_schemas('before_flush')
+        # taken after the validators ran so converted values are what's compared next time
+        self.fingerprint = None if self.has_errors else self.fingerprint_values()
+        return has_error
+
+    def run_plan(self, entries, flag_convert, state, field_names=None):
+        """
+            Runs the compiled plan entries (see ValidationMixin._sav_compile_plan) against
+            the entity, recording an error for each field that fails.  Converted values are
+            only applied when all the entries validated.
+        """
+        entity = self.entity
+        failures, converted = _apply_plan(entity, getattr, entries, flag_convert, state,
+                                          field_names)
+        if failures:
+            for key, msg in failures:
+                self.add_error(key, msg)
             return True
+        if converted:
+            entity.__dict__.update(converted)
         return False
 
     def run_event_schemas(self, event):
-        has_error = False
-        if self.entity._sav_fe_schemas:
-            val_schema, conv_schema = self.entity._sav_fe_schemas[event]
-            if self.validate_fe_schema(val_schema, False):
-                has_error = True
-            if self.validate_fe_schema(conv_schema, True):
+        val_entries, conv_entries = self.entity._sav_event_plans[event]
+        if not val_entries and not conv_entries:
+            return False
+        field_names = self.dirty_field_names()
+        assigned = self.assigned if event == 'before_flush' else None
+        if assigned:
+            return self.run_with_assigned(assigned, field_names)
+        state = _FEState(self.entity)
+        has_error = self.run_plan(val_entries, False, state, field_names)
+        if self.run_plan(conv_entries, True, state, field_names):
+            has_error = True
+        return has_error
+
+    def validate_assigned(self, key, value):
+        """
+            Validates a value as it's assigned to a field and returns the value to assign,
+            converted when the field has converters.  The result is kept until the next
+            flush, which only validates the fields that weren't assigned since the last one.
+        """
+        entity = self.entity
+        val_entries, conv_entries = entity._sav_assign_plans[key]
+        source = {key: value}
+        state = _FEState(entity)
+        failures, _ = _apply_plan(source, dict.get, val_entries, False, state)
+        conv_failures, converted = _apply_plan(source, dict.get, conv_entries, True, state)
+        if conv_failures:
+            failures = (failures or []) + conv_failures
+        if failures and entity._sav_validate_on_set == 'raise':
+            raise formencode.Invalid('; '.join(msg for _, msg in failures), value, state)
+
+        assigned = self.assigned
+        if assigned is None:
+            assigned = self.assigned = {}
+        assigned[key] = [msg for _, msg in failures] if failures else []
+        # fields validated against the old value of this one need validating again
+        for dependent in entity._sav_dirty_dependents.get(key, ()):
+            assigned.pop(dependent, None)
+        if failures or not converted:
+            return value
+        return converted[key]
+
+    def run_with_assigned(self, assigned, field_names):
+        """
+            before_flush validation of an entity with fields validated as they were assigned:
+            their results are used as they are and the other fields are validated.
+        """
+        self.assigned = None
+        entity = self.entity
+        if field_names is None:
+            field_names = entity._sav_class_metadata().event_fields['before_flush']
+        field_names = set(field_names).difference(assigned)
+        val_entries, conv_entries = entity._sav_event_plans['before_flush']
+        state = _FEState(entity)
+        has_error = self.run_plan(val_entries, False, state, field_names)
+        if self.run_plan(conv_entries, True, state, field_names):
+            has_error = True
+        for key, messages in six.iteritems(assigned):
+            for msg in messages:
+                self.add_error(key, msg)
                 has_error = True
         return has_error
 
 
+# the (fingerprint, assigned) of the entities using the 'instance_state' backend, by their
+# InstanceState.  Unlike the errors, they aren't kept in its info dict: SA pickles that with the
+# entity, and they only matter for the entity's next flush.
+_transient_state = weakref.WeakKeyDictionary()
+
+
+class _StateInfoHelper(_ValidationHelper):
+    """
+        The helper used with the 'instance_state' backend (see
+        ValidationMixin._sav_state_backend).  It's created each time it's asked for and holds
+        the entity itself, keeping the errors in the info dict of the entity's InstanceState,
+        which lives and dies with the entity.  The info dict is only created once there is
+        something to keep in it.
+    """
+    __slots__ = ('_entity', '_state')
+
+    def __init__(self, entity):
+        self._entity = entity
+        self._state = saorm.attributes.instance_state(entity)
+
+    @property
+    def entity(self):
+        return self._entity
+
+    def _existing_info(self):
+        # info is memoized in the state's __dict__, looking there doesn't create it.  (On
+        # Python 3.11+ it does create the __dict__ itself, which SA doesn't otherwise need.)
+        try:
+            return self._state.__dict__.get('info')
+        except AttributeError:
+            return self._state.info
+
+    def _get(self, key):
+        info = self._existing_info()
+        return None if info is None else info.get(key)
+
+    def _set(self, key, value):
+        if value is not None:
+            self._state.info[key] = value
+            return
+        info = self._existing_info()
+        if info:
+            info.pop(key, None)
+
+    @property
+    def _errors(self):
+        return self._get('sav_errors')
+
+    @_errors.setter
+    def _errors(self, errors):
+        self._set('sav_errors', errors)
+
+    def _get_transient(self, index):
+        values = _transient_state.get(self._state)
+        return None if values is None else values[index]
+
+    def _set_transient(self, index, value):
+        values = _transient_state.get(self._state)
+        if values is None:
+            if value is None:
+                return
+            values = _transient_state[self._state] = [None, None]
+        values[index] = value
+        if values[0] is None and values[1] is None:
+            del _transient_state[self._state]
+
+    @property
+    def fingerprint(self):
+        return self._get_transient(0)
+
+    @fingerprint.setter
+    def fingerprint(self, fingerprint):
+        self._set_transient(0, fingerprint)
+
+    @property
+    def assigned(self):
+        return self._get_transient(1)
+
+    @assigned.setter
+    def assigned(self, assigned):
+        self._set_transient(1, assigned)
+
+    def __getstate__(self):
+        raise TypeError('the helper of the instance_state backend is not stored on the entity'
+                        ' and can not be pickled')
+
+
+def _validate_assigned(target, value, oldvalue, initiator):
+    # the attribute set event listener of classes with _sav_validate_on_set
+    return target._sav.validate_assigned(initiator.key, value)
+
+
+def _group_by_class(instances):
+    """ maps the classes of the instances using the mixin to their (index, instance) pairs """
+    by_class = defaultdict(list)
+    for index, instance in enumerate(instances):
+        if hasattr(instance, '_sav_validate'):
+            by_class[type(instance)].append((index, instance))
+    return by_class
+
+
+def _existing_helper(entity):
+    """ the entity's helper, or None when it doesn't have one yet and so has no errors """
+    if entity._sav_state_backend == 'instance_state':
+        return _StateInfoHelper(entity)
+    return entity.__dict__.get('_sav')
+
+
+def _forget_assigned(target, attrs):
+    # the expire event listener of classes with _sav_validate_on_set, instances without a
+    # helper yet don't get one
+    helper = _existing_helper(target)
+    assigned = None if helper is None else helper.assigned
+    if not assigned:
+        return
+    if attrs is None:
+        helper.assigned = None
+        return
+    dependents = target._sav_dirty_dependents
+    for key in attrs:
+        assigned.pop(key, None)
+        for dependent in dependents.get(key, ()):
+            assigned.pop(dependent, None)
+
+
+def _forget_refreshed(target, context, attrs):
+    # the refresh event listener of classes with _sav_validate_on_set
+    _forget_assigned(target, attrs)
+
+
+class _LazyHelper(object):
+    """
+        Creates an instance's _ValidationHelper the first time it is needed.  Since this is
+        a non-data descriptor, the helper stored on the instance is found directly from then
+        on.  Most instances SA loads are never flushed, so they never pay for a helper.
+    """
+    def __get__(self, entity, cls):
+        if entity is None:
+            return self
+        if entity._sav_state_backend == 'instance_state':
+            return _StateInfoHelper(entity)
+        entity._sav_initialize()
+        return entity.__dict__['_sav']
+
+
 class ValidationMixin(object):
     _sav_do_validation = True
+    # a concurrent.futures style executor (anything with map()) to validate large flushes
+    # with, set it here for all classes, on a class, or as session.info['sav_executor']
+    _sav_executor = None
+    # how many entities go to the executor at once, session.info['sav_executor_chunk_size']
+    # overrides it
+    _sav_executor_chunk_size = 1000
+    # stop validating a flush at the first invalid instance, or once there are this many
+    # invalid instances; the ValidationError raised is then marked as truncated.  Set them
+    # here for all classes, on a class, or with session.info['sav_fail_fast'] and
+    # session.info['sav_max_errors'] for all the classes flushed by a session.
+    _sav_fail_fast = False
+    _sav_max_errors = None
+    # when True, persistent instances only have the fields that changed (plus fields
+    # depending on those, see the sav_depends_on validator argument) validated on flush
+    _sav_validate_dirty_only = False
+    # when True, instances which were validated without errors aren't validated again before
+    # flush until the values of their validated fields change, e.g. when autoflush flushes an
+    # instance for an unvalidated column or a relationship.  The values and their types are
+    # compared, values other than scalars always validate again.
+    _sav_skip_unchanged = False
+    # whether the before_flush methods of instances skipped by _sav_skip_unchanged still run;
+    # when False, they only run when the values changed too
+    _sav_skip_runs_before_flush = True
+    # when True, instances without validation errors are pickled without their helper, which
+    # is created again when it's next needed, e.g. for instances kept in an external cache
+    _sav_compact_pickle = True
+    # where an instance's validation errors are kept: 'helper' stores a _ValidationHelper
+    # with a weak reference back to the instance on it, 'instance_state' keeps them in the
+    # info dict of its SQLAlchemy InstanceState, which saves the helper and weak reference
+    # objects of each instance validated but creates a short lived helper every time one is
+    # needed.  Set it before instances are validated.
+    _sav_state_backend = 'helper'
+    # when True, fields validated before flush are also validated as values are assigned to
+    # them, through SQLAlchemy's attribute set events, and flushes only validate the fields
+    # that weren't assigned since the last flush.  This spreads the cost of validation over
+    # the building of a unit of work.  With 'raise', an invalid value isn't assigned and the
+    # assignment raises formencode.Invalid.  Only assignments fire the events, not loads or
+    # changes made through __dict__.  Set it in the class definition.
+    _sav_validate_on_set = False
+
+    # (method name, field names or None) of the coroutine methods decorated with
+    # savalidation.aio.validates() or savalidation.aio.before_flush
+    _sav_async_methods = ()
+    # validators.BatchValidator instances, which validate all the instances of the class
+    # being flushed at once
+    _sav_batch_validators = ()
+
+    _sav = _LazyHelper()
 
     def _sav_initialize(self):
         self._sav = _ValidationHelper(self)
 
+    def __getstate__(self):
+        state = self.__dict__
+        helper = state.get('_sav')
+        if helper is not None and self._sav_compact_pickle and not helper.has_errors:
+            state = state.copy()
+            del state['_sav']
+        return state
+
     @property
     def validation_errors(self):
         return self._sav.errors
@@ -151,9 +823,21 @@ class ValidationMixin(object):
         return self._sav.add_error(field_name, msg)
 
     @classmethod
-    def _sav_column_names(self):
-        return [p.key for p in self.__mapper__.iterate_properties
-                if isinstance(p, saorm.ColumnProperty)]
+    def _sav_column_names(cls):
+        return list(cls._sav_class_metadata().column_names)
+
+    @classmethod
+    def _sav_class_metadata(cls):
+        """
+            Returns the cached mapper metadata for the class.  It is rebuilt when the class
+            is mapped again (e.g. after clear_mappers()) or reconfigured.
+        """
+        mapper = cls.__mapper__
+        metadata = cls.__dict__.get('_sav_metadata')
+        if metadata is None or metadata.mapper is not mapper:
+            metadata = _ClassMetadata(mapper, getattr(cls, '_sav_plan', ()))
+            cls._sav_metadata = metadata
+        return metadata
 
     def to_dict(self, exclude=[]):
         data = dict([(name, getattr(self, name))
@@ -166,7 +850,7 @@ class ValidationMixin(object):
         """
             This method is called when the class is finished initializing to
             take all the validation info that was associated with the class
-            and turn it into formencode schemas that can be used later by the
+            and compile it into validation plans that can be used later by the
             instances to do validation.
         """
 
@@ -174,6 +858,9 @@ class ValidationMixin(object):
         if not getattr(cls, '_sav_do_validation', False):
             return
 
+        # the mapper has been (re)configured, so any cached metadata is stale
+        cls._sav_metadata = _ClassMetadata(mapper, getattr(cls, '_sav_plan', ()))
+
         # only want this to run once per class
         if getattr(cls, '_sav_class_init_already_ran', False):
             return
@@ -183,68 +870,170 @@ class ValidationMixin(object):
         cls._sav_class_init_already_ran = True
         if not hasattr(cls, '_sav_entity_linkers'):
             cls._sav_entity_linkers = ()
-        cls._sav_fe_schemas = {}
-        cls._sav_before_flush_methods = []
+        cls._sav_dirty_dependents = defaultdict(set)
 
         # gather all the fev_metas from all entity linkers into one place
         all_fev_metas = []
+        batch_validators = []
         for val_class, args, kwargs in cls._sav_entity_linkers:
             # val_class should be a subclass of ValidatorBase
             sav_val = val_class(cls, *args, **kwargs)
             all_fev_metas.extend(sav_val.fev_metas)
+            batch_validators.extend(getattr(sav_val, 'batch_validators', ()))
+        cls._sav_batch_validators = tuple(batch_validators)
+
+        # map each column to the fields that need validating when it changes
+        for fevm in all_fev_metas:
+            for colname in fevm.depends_on:
+                cls._sav_dirty_dependents[colname].add(fevm.field_name)
 
-        # create the formencode schemas to validate with
-        cls._sav_fe_schemas['before_flush'] = \
-            cls._sav_create_fe_schema(all_fev_metas, 'before_flush', False), \
-            cls._sav_create_fe_schema(all_fev_metas, 'before_flush', True)
+        # compile the validators into the plan the instances validate with
+        cls._sav_set_plan(cls._sav_compile_plan(all_fev_metas))
 
-        cls._sav_fe_schemas['before_exec'] = \
-            cls._sav_create_fe_schema(all_fev_metas, 'before_exec', False), \
-            cls._sav_create_fe_schema(all_fev_metas, 'before_exec', True)
+        if cls._sav_validate_on_set:
+            cls._sav_listen_for_assignments()
 
-        # setup methods that have been decorated with the before_flush event
+        cls._sav_init_marked_methods()
+
+    @classmethod
+    def _sav_listen_for_assignments(cls):
+        """ sets up the listeners validating values as they are assigned """
+        for key in cls._sav_assign_plans:
+            sa.event.listen(getattr(cls, key), 'set', _validate_assigned, retval=True,
+                            propagate=True)
+        # the results no longer apply once the values are expired, e.g. by a rollback, or
+        # loaded again
+        sa.event.listen(cls, 'expire', _forget_assigned, propagate=True)
+        sa.event.listen(cls, 'refresh', _forget_refreshed, propagate=True)
+
+    @classmethod
+    def _sav_init_marked_methods(cls):
+        """ finds the methods decorated with before_flush and the async validators """
+        cls._sav_before_flush_methods = []
+        async_methods = []
         for attr_name, attr_obj in six.iteritems(cls.__dict__):
-            # test for a value, not just the presence of the attribute to avoid
-            # collecting methods that have been mocked and will therefore
-            # have all attributes.
-            if getattr(attr_obj, '_sav_before_flush', False) == 'yes':
+            # the decorators set function attributes, so only the object's own __dict__ is
+            # looked at.  getattr() would be slow for the mapped attributes, which look for a
+            # missing attribute on their column, and would find anything on mocked methods.
+            marks = getattr(attr_obj, '__dict__', None)
+            if not marks:
+                continue
+            if marks.get('_sav_before_flush') == 'yes':
                 # don't want to get into trouble w/ strong references, so only
                 # keep a copy of the name of the attribute
                 cls._sav_before_flush_methods.append(attr_name)
+            async_mark = marks.get('_sav_async')
+            if isinstance(async_mark, tuple):
+                async_methods.append((attr_name, async_mark[1]))
+        cls._sav_async_methods = tuple(async_methods)
 
     @classmethod
-    def _sav_create_fe_schema(cls, fev_metas, for_event, for_conversion):
-        schema = formencode.Schema(allow_extra_fields=True)
+    def _sav_compile_plan(cls, fev_metas):
+        """
+            Flattens the validators into a tuple of plan entries, one per field, event and
+            conversion flag, in column order.  Each entry holds the to_python() methods of the
+            field's validators in the order formencode.compound.All would call them.
+        """
         field_validators = defaultdict(list)
         for fevm in fev_metas:
-            if fevm.event == for_event and fevm.is_converter == for_conversion:
-                field_validators[fevm.field_name].append(fevm.fev)
-        for fieldname, validators in six.iteritems(field_validators):
-            schema.add_field(fieldname, formencode.compound.All(*validators))
-        return schema
+            field_validators[fevm.field_name, fevm.event, fevm.is_converter].append(fevm.fev)
+        column_order = dict(
+            (colname, index)
+            for index, colname in enumerate(cls._sav_class_metadata().column_names)
+        )
+        event_order = dict((event, index) for index, event in enumerate(FEVMeta.ALL_EVENTS))
+        plan = []
+        for key in sorted(field_validators, key=lambda key: (
+                column_order.get(key[0], -1), event_order[key[1]], key[2])):
+            colname, event, is_converter = key
+            if colname not in column_order:
+                continue
+            validators = field_validators[key]
+            accept_iterator = all(getattr(v, 'accept_iterator', False) for v in validators)
+            plan.append(_PlanEntry(
+                colname,
+                tuple(v.to_python for v in reversed(validators)),
+                event,
+                is_converter,
+                accept_iterator,
+            ))
+        return tuple(plan)
+
+    @classmethod
+    def _sav_set_plan(cls, plan):
+        """ installs a compiled plan on the class, split up by event for the instances """
+        cls._sav_plan = plan
+        cls._sav_class_metadata().set_plan(plan)
+        cls._sav_event_plans = {}
+        for event in FEVMeta.ALL_EVENTS:
+            cls._sav_event_plans[event] = \
+                tuple(e for e in plan if e.event == event and not e.is_converter), \
+                tuple(e for e in plan if e.event == event and e.is_converter)
+        # the before_flush entries of each field, for validating values as they are assigned
+        cls._sav_assign_plans = {}
+        for entry in plan:
+            if entry.event != 'before_flush':
+                continue
+            val_entries, conv_entries = cls._sav_assign_plans.get(entry.key, ((), ()))
+            if entry.is_converter:
+                conv_entries += (entry,)
+            else:
+                val_entries += (entry,)
+            cls._sav_assign_plans[entry.key] = val_entries, conv_entries
 
     @classmethod
     def _sav_validate(cls, instance, type):
         if type == 'before_flush':
+            if instance._sav_skip_unchanged:
+                return instance._sav.validate_if_changed()
             instance._sav.clear_errors()
             instance._sav.trigger_before_flush_methods()
 
         return instance._sav.run_event_schemas(type)
 
+    @staticmethod
+    def validate_many(instances, event='before_flush'):
+        """
+            Validates the instances the same way a flush would for the given event, or for
+            each event of a sequence of them in turn, but without a Session.  Errors from an
+            earlier call are cleared first.  Returns a dict mapping the index of each invalid
+            instance to its validation errors.  Instances that don't use the mixin are ignored.
 
-class _EventHandler(object):
+            Instances are grouped by class so the class level lookups are done once per class
+            instead of once per instance, and the plans are applied directly: only instances
+            with errors get a helper.
+        """
+        events = (event,) if isinstance(event, six.string_types) else tuple(event)
+        report = {}
+        for ent_cls, indexed_instances in six.iteritems(_group_by_class(instances)):
+            plans = [ent_cls._sav_event_plans[name] for name in events]
+            before_flush_methods = ()
+            if 'before_flush' in events:
+                before_flush_methods = ent_cls._sav_before_flush_methods
+            dirty_only = ent_cls._sav_validate_dirty_only
+            state = _FEState(None)
+            for index, instance in indexed_instances:
+                helper = _existing_helper(instance)
+                if helper is not None:
+                    helper.clear_errors()
+                for mname in before_flush_methods:
+                    getattr(instance, mname)()
+                field_names = _dirty_field_names(instance) if dirty_only else None
+                state.entity = instance
+                failures = _apply_event_plans(instance, plans, state, field_names)
+                if failures:
+                    helper = instance._sav
+                    for key, msg in failures:
+                        helper.add_error(key, msg)
+                elif before_flush_methods:
+                    # they can add errors themselves
+                    helper = _existing_helper(instance)
+                if helper is not None and helper.has_errors:
+                    report[index] = helper.errors
+        return report
 
-    @staticmethod
-    @sa.event.listens_for(saorm.mapper, 'init')
-    def initialize_validators_for_init(target, args, kwargs):
-        if hasattr(target, '_sav_initialize'):
-            target._sav_initialize()
 
-    @staticmethod
-    @sa.event.listens_for(saorm.mapper, 'load')
-    def initialize_validators_for_load(target, context):
-        if hasattr(target, '_sav_initialize'):
-            target._sav_initialize()
+class _EventHandler(object):
 
     @staticmethod
     def handle_insert(mapper, connection, target):
@@ -257,42 +1046,154 @@ class _EventHandler(object):
     def handle_before_exec(mapper, connection, target):
         if not hasattr(target, '_sav_validate'):
             return
-        sess = saorm.session.Session.object_session(target)
-        sess._sav_ent_exec_count -= 1
+        # cheaper than looking up the session itself for every row
+        flush = _flush_contexts[saorm.attributes.instance_state(target).session_id]
+        flush.remaining -= 1
 
+        had_errors = target._sav.has_errors
         target._sav_validate(target, 'before_exec')
+        if not had_errors and target._sav.has_errors:
+            flush.invalid.append(target)
+            if flush.remaining > 0 and flush.limit_reached(target):
+                raise flush.error(truncated=True)
 
-        if sess._sav_ent_exec_count == 0:
-            ents_with_error = []
-            for ent in sess._sav_ents_to_validate:
-                if ent.validation_errors:
-                    ents_with_error.append(ent)
-            if ents_with_error:
-                raise ValidationError(ents_with_error)
-
-    @classmethod
-    def before_flush(cls, session, flush_context, instances):
-        ents_to_validate = session._sav_ents_to_validate = []
+        # Raising before the last row is executed keeps the database from rejecting it first.
+        # Dirty instances without net changes are not counted but still get here, so
+        # after_flush() checks again for whatever comes after.
+        if flush.remaining == 0 and flush.invalid:
+            raise flush.error()
 
-        for ent in session.new:
-            if not hasattr(ent, '_sav_validate'):
+    @staticmethod
+    def entities_to_validate(session):
+        """
+            Returns the new instances and the dirty ones with net changes that use the mixin,
+            the ones among them with async validators and the ones with batch validators by
+            class.
+        """
+        ents_to_validate = []
+        ents_with_async = []
+        ents_for_batches = defaultdict(list)
+        for ent, is_new in chain(((ent, True) for ent in session.new),
+                                 ((ent, False) for ent in session.dirty)):
+            if not hasattr(ent, '_sav_validate') or not (is_new or session.is_modified(ent)):
                 continue
             ents_to_validate.append(ent)
+            if ent._sav_async_methods:
+                ents_with_async.append(ent)
+            if ent._sav_batch_validators:
+                ents_for_batches[type(ent)].append(ent)
+        return ents_to_validate, ents_with_async, ents_for_batches
 
-        for ent in session.dirty:
-            if not hasattr(ent, '_sav_validate'):
-                continue
-            if session.is_modified(ent):
-                ents_to_validate.append(ent)
+    @classmethod
+    def before_flush(cls, session, flush_context, instances):
+        ents_to_validate, ents_with_async, ents_for_batches = cls.entities_to_validate(session)
 
         # save the number of instances so we know when to raise in the
         # handle_before_exec() method above
-        session._sav_ent_exec_count = len(ents_to_validate)
+        previous = getattr(session, '_sav_flush', None)
+        if previous is not None:
+            previous.finish()
+        flush = session._sav_flush = _FlushContext(session, len(ents_to_validate))
+
+        cls.validate_entities(session, flush, ents_to_validate)
+        cls.run_batch_validators(session, flush, ents_for_batches)
+        if ents_with_async:
+            # only importable where there is asyncio, which async methods need anyway
+            from savalidation.aio import run_async_validators
+            for ent in run_async_validators(ents_with_async):
+                flush.add_invalid(ent)
+
+    @classmethod
+    def validate_entities(cls, session, flush, ents):
+        """ runs the before_flush validation, on an executor for the classes that use one """
+        session_executor = session.info.get('sav_executor')
+        ents_for_executor = defaultdict(list)
+        for ent in ents:
+            if session_executor is None and ent._sav_executor is None:
+                ent._sav_validate(ent, 'before_flush')
+                if ent._sav.has_errors:
+                    flush.add_invalid(ent)
+            else:
+                ents_for_executor[type(ent)].append(ent)
+
+        for ent_cls, ents in six.iteritems(ents_for_executor):
+            cls.validate_with_executor(session, ent_cls, ents)
+            for ent in ents:
+                if ent._sav.has_errors:
+                    flush.add_invalid(ent)
+
+    @staticmethod
+    def run_batch_validators(session, flush, ents_for_batches):
+        for ent_cls, ents in six.iteritems(ents_for_batches):
+            valid_before = [ent for ent in ents if not ent._sav.has_errors]
+            for batch_validator in ent_cls._sav_batch_validators:
+                batch_validator.validate(session, ents)
+            for ent in valid_before:
+                if ent._sav.has_errors:
+                    flush.add_invalid(ent)
+
+    @staticmethod
+    def after_flush(session, flush_context):
+        flush = getattr(session, '_sav_flush', None)
+        if flush is None:
+            return
+        flush.finish()
+        session._sav_flush = None
+        if flush.invalid:
+            raise flush.error()
+
+    @staticmethod
+    def after_soft_rollback(session, previous_transaction):
+        # a flush that failed part way through never gets to after_flush()
+        flush = getattr(session, '_sav_flush', None)
+        if flush is not None:
+            flush.finish()
+
+    @staticmethod
+    def validate_with_executor(session, ent_cls, ents):
+        """
+            Validates the entities in chunks on the session's or class's executor.  before_flush
+            methods run here, then the values to validate are copied so the workers never touch
+            the entities.  Errors and converted values are applied in the order of `ents`.
+        """
+        executor = session.info.get('sav_executor') or ent_cls._sav_executor
+        chunk_size = session.info.get('sav_executor_chunk_size',
+                                      ent_cls._sav_executor_chunk_size)
+        # not worth handing off work that fits in a single chunk
+        if len(ents) <= chunk_size:
+            for ent in ents:
+                ent._sav_validate(ent, 'before_flush')
+            return
+
+        event_fields = ent_cls._sav_class_metadata().event_fields['before_flush']
+        snapshots = []
+        for ent in ents:
+            helper = ent._sav
+            helper.clear_errors()
+            # all the changed fields are validated again
+            helper.assigned = None
+            helper.trigger_before_flush_methods()
+            field_names = helper.dirty_field_names()
+            if field_names is None:
+                field_names = event_fields
+            snapshots.append(dict((key, getattr(ent, key, None))
+                                  for key in field_names if key in event_fields))
 
-        for ent in ents_to_validate:
-            ent._sav_validate(ent, 'before_flush')
+        chunks = [snapshots[i:i + chunk_size] for i in range(0, len(snapshots), chunk_size)]
+        results = executor.map(_validate_snapshots, [ent_cls] * len(chunks), chunks)
+        ents = iter(ents)
+        for chunk_results in results:
+            for failures, converted in chunk_results:
+                ent = next(ents)
+                if failures:
+                    for key, msg in failures:
+                        ent._sav.add_error(key, msg)
+                if converted:
+                    ent.__dict__.update(converted)
 
 sa.event.listen(saorm.Session, 'before_flush', _EventHandler.before_flush)
+sa.event.listen(saorm.Session, 'after_flush', _EventHandler.after_flush)
+sa.event.listen(saorm.Session, 'after_soft_rollback', _EventHandler.after_soft_rollback)
 
 
 def watch_session(sess):
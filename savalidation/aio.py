@@ -0,0 +1,114 @@
+"""
+    Validators declared as coroutines, for validation that does I/O like remote lookups or
+    existence checks against another database.  Python 3.5+ only.
+
+        import savalidation.aio as aio
+
+        class Account(Base, ValidationMixin):
+            email = sa.Column(sa.Unicode(255))
+
+            @aio.validates('email')
+            async def email_deliverable(self, field_name, value):
+                if value and not await mailcheck.deliverable(value):
+                    raise formencode.Invalid('undeliverable address', value, None)
+
+            @aio.before_flush
+            async def check_credit(self):
+                if not await credit.approved(self.id):
+                    self.add_validation_error('id', 'credit not approved')
+
+    Flushes run the synchronous validation first, then all of the async validators of the
+    flushed instances concurrently with asyncio.gather().  When flushed through SQLAlchemy's
+    AsyncSession the coroutines run on the session's event loop; with a regular Session they
+    run on a new event loop, which isn't possible from a thread already running one.
+"""
+from __future__ import absolute_import
+import asyncio
+
+import formencode
+import sqlalchemy as sa
+
+try:
+    from sqlalchemy.util import await_only
+except ImportError:
+    # before SQLAlchemy 1.4 and its asyncio support
+    await_only = None
+
+
+def validates(*field_names):
+    """
+        Use to decorate a coroutine method validating the given fields before flush.  It's
+        called as method(field_name, value) for each field and raises formencode.Invalid when
+        the value isn't valid.
+    """
+    def decorate(f):
+        f._sav_async = ('validates', field_names)
+        return f
+    return decorate
+
+
+def before_flush(f):
+    """
+        Use to decorate a coroutine method so that it's awaited before flush, after the
+        synchronous validation.  Like savalidation.helpers.before_flush, it's only called for
+        instances that are new or dirty and can add validation errors.
+    """
+    f._sav_async = ('before_flush', None)
+    return f
+
+
+def _calls_for(ent):
+    """ yields (field name or None, method, args) for each async validation of `ent` """
+    field_names = ent._sav.dirty_field_names()
+    for mname, validated_fields in ent._sav_async_methods:
+        method = getattr(ent, mname)
+        if validated_fields is None:
+            yield None, method, ()
+            continue
+        for field_name in validated_fields:
+            if field_names is None or field_name in field_names:
+                yield field_name, method, (field_name, getattr(ent, field_name, None))
+
+
+async def _gather(calls):
+    return await asyncio.gather(
+        *[method(*args) for _, _, method, args in calls], return_exceptions=True
+    )
+
+
+def _wait_for(calls):
+    if await_only is not None:
+        coro = _gather(calls)
+        try:
+            # in the greenlet AsyncSession runs the flush in
+            return await_only(coro)
+        except sa.exc.MissingGreenlet:
+            coro.close()
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(_gather(calls))
+    finally:
+        loop.close()
+
+
+def run_async_validators(entities):
+    """
+        Awaits the async validators of all the entities concurrently and records their
+        errors.  Returns the entities which had no errors before but have some now.
+    """
+    calls = []
+    valid_before = []
+    for ent in entities:
+        if not ent._sav.has_errors:
+            valid_before.append(ent)
+        calls.extend((ent,) + call for call in _calls_for(ent))
+    if not calls:
+        return []
+
+    results = _wait_for(calls)
+    for (ent, field_name, _, _), result in zip(calls, results):
+        if isinstance(result, formencode.Invalid) and field_name is not None:
+            ent._sav.add_error(field_name, result.unpack_errors())
+        elif isinstance(result, BaseException):
+            raise result
+    return [ent for ent in valid_before if ent._sav.has_errors]
@@ -0,0 +1,43 @@
+"""
+    Benchmarks for the validation hot paths.  They are not part of the test suite, run a
+    benchmark module directly, e.g.:
+
+        python -m savalidation.benchmarks.plan
+
+    or run all of them and save the results as JSON so releases can be compared:
+
+        python -m savalidation.benchmarks.suite results.json
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+from timeit import default_timer
+
+
+def best_of(func, repeat=5, number=1, setup=None):
+    """
+        returns the fastest time, in seconds, of `repeat` runs of `number` calls to func.  If
+        given, setup() is called before each run, outside of the timing, and its return value is
+        passed to func.
+    """
+    timings = []
+    for _ in range(repeat):
+        args = () if setup is None else (setup(),)
+        start = default_timer()
+        for _ in range(number):
+            func(*args)
+        timings.append(default_timer() - start)
+    return min(timings)
+
+
+def report(name, seconds, count):
+    """ prints a timing and returns it as a dict suitable for the JSON results """
+    print('{0:<40} {1:>10.2f} ms {2:>10.2f} us/entity'.format(
+        name, seconds * 1000, seconds * 1000000 / count
+    ))
+    return {
+        'name': name,
+        'seconds': seconds,
+        'count': count,
+        'us_per_entity': seconds * 1000000 / count,
+    }
@@ -0,0 +1,43 @@
+"""
+    Compares ValidationMixin.validate_many() to validating the same instances one at a time.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+import sqlalchemy.orm as saorm
+
+from savalidation import ValidationMixin
+from savalidation.benchmarks import best_of, report
+from savalidation.benchmarks.models import Family, Wide, family_values, wide_values
+
+
+def validate_each(entities):
+    for entity in entities:
+        entity._sav_validate(entity, 'before_flush')
+
+
+def make_entities(count):
+    entities = []
+    for i in range(count):
+        entities.append(Family(**family_values(i)))
+        entities.append(Wide(**wide_values(i)))
+    return entities
+
+
+def run(count=5000):
+    saorm.configure_mappers()
+    # each way gets its own instances, validate_many() doesn't give valid ones a helper
+    entities = make_entities(count)
+    each_time = best_of(lambda: validate_each(entities))
+    entities = make_entities(count)
+    many_time = best_of(lambda: ValidationMixin.validate_many(entities))
+    results = [
+        report('per instance', each_time, len(entities)),
+        report('validate_many()', many_time, len(entities)),
+    ]
+    print('speedup {0:.2f}x'.format(each_time / many_time))
+    return results
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,96 @@
+"""
+    Measures flushing new and dirty entities for models using the validation mixin, compared to
+    the same model without it.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+import sqlalchemy.orm as saorm
+
+from savalidation.benchmarks import best_of, report
+from savalidation.benchmarks.models import Family, Person, Plain, Session, family_values, \
+    setup_db
+
+
+class _Sessions(object):
+    """ hands out a fresh session for each timed run, closing the one from the previous run """
+
+    def __init__(self):
+        self.sess = None
+
+    def new(self):
+        self.close()
+        self.sess = Session()
+        return self.sess
+
+    def close(self):
+        if self.sess is not None:
+            self.sess.rollback()
+            self.sess.close()
+            self.sess = None
+
+
+def person_values(i):
+    return dict(name_first=u'first {0}'.format(i), name_last=u'last {0}'.format(i),
+                family_role=u'child', email='person{0}@example.com'.format(i),
+                birthdate='05/{0:02d}/2010'.format(i % 28 + 1))
+
+
+def time_new(sessions, count, with_people):
+    def setup():
+        sess = sessions.new()
+        for i in range(count):
+            family = Family(**family_values(i))
+            sess.add(family)
+            if with_people:
+                sess.add(Person(family=family, **person_values(i)))
+        return sess
+    return best_of(lambda sess: sess.flush(), setup=setup)
+
+
+def time_new_plain(sessions, count):
+    def setup():
+        sess = sessions.new()
+        sess.add_all([Plain(**family_values(i)) for i in range(count)])
+        return sess
+    return best_of(lambda sess: sess.flush(), setup=setup)
+
+
+def time_dirty(sessions, cls):
+    def setup():
+        sess = sessions.new()
+        for entity in sess.query(cls):
+            entity.name = entity.name + u' updated'
+        return sess
+    return best_of(lambda sess: sess.flush(), setup=setup)
+
+
+def insert_rows(count):
+    sess = Session()
+    for cls in (Family, Plain):
+        sess.execute(cls.__table__.insert(), [family_values(i) for i in range(count)])
+    sess.commit()
+    sess.close()
+
+
+def run(count=2000):
+    saorm.configure_mappers()
+    setup_db()
+    sessions = _Sessions()
+    results = [
+        report('flush new without mixin', time_new_plain(sessions, count), count),
+        report('flush new families', time_new(sessions, count, False), count),
+        report('flush new families and people', time_new(sessions, count, True), count * 2),
+    ]
+    sessions.close()
+    insert_rows(count)
+    results.extend([
+        report('flush dirty without mixin', time_dirty(sessions, Plain), count),
+        report('flush dirty families', time_dirty(sessions, Family), count),
+    ])
+    sessions.close()
+    return results
+
+
+if __name__ == '__main__':
+    run()
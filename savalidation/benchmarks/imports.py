@@ -0,0 +1,66 @@
+"""
+    Times importing savalidation in a new interpreter with python -X importtime (Python 3.7+).
+    SQLAlchemy and formencode are imported first, they are needed anyway, so the timings are
+    those of savalidation and the modules it imports itself.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+import subprocess
+import sys
+
+from savalidation.benchmarks import report
+
+# dependencies only imported once the validators needing them are used
+LAZY_MODULES = ('dateutil', 'dateutil.parser')
+PRELOAD = ('sqlalchemy', 'sqlalchemy.orm', 'formencode')
+# -X importtime is new in Python 3.7
+SUPPORTED = sys.version_info >= (3, 7)
+
+
+def import_times(module='savalidation', preload=PRELOAD):
+    """
+        Imports `module` in a new interpreter after the `preload` modules and returns a dict
+        mapping each module imported along with it to (self, cumulative) import time in
+        seconds.
+    """
+    statement = 'import {0}'.format(module)
+    if preload:
+        statement = 'import {0}; {1}'.format(', '.join(preload), statement)
+    proc = subprocess.Popen([sys.executable, '-X', 'importtime', '-c', statement],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    _, stderr = proc.communicate()
+    if proc.returncode:
+        raise RuntimeError('importing {0} failed:\n{1}'.format(module, stderr))
+
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        top_level = not name[1:].startswith(' ')
+        name = name.strip()
+        # lines come as imports finish, so the preloaded modules all come first
+        if preload and top_level and name == preload[-1]:
+            times = {}
+            continue
+        times[name] = (int(self_us) / 1000000.0, int(cumulative_us) / 1000000.0)
+    return times
+
+
+def run(count=5):
+    results = []
+    best = None
+    for _ in range(count):
+        times = import_times()
+        if best is None or times['savalidation'][1] < best['savalidation'][1]:
+            best = times
+    results.append(report('import savalidation', best['savalidation'][1], 1))
+    for name, (_, cumulative) in sorted(best.items(), key=lambda item: -item[1][1])[1:6]:
+        results.append(report('  {0}'.format(name), cumulative, 1))
+    return results
+
+
+if __name__ == '__main__':
+    run()
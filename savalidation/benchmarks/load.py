@@ -0,0 +1,44 @@
+"""
+    Measures loading rows through the ORM for a model using the validation mixin compared to
+    the same model without it.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+import sqlalchemy.orm as saorm
+
+from savalidation.benchmarks import best_of, report
+from savalidation.benchmarks.models import Family, Plain, Session, family_values, setup_db
+
+
+def insert_rows(count):
+    sess = Session()
+    for cls in (Family, Plain):
+        sess.execute(cls.__table__.insert(), [family_values(i) for i in range(count)])
+    sess.commit()
+    sess.close()
+
+
+def load(cls):
+    sess = Session()
+    for _ in sess.query(cls).yield_per(1000):
+        pass
+    sess.close()
+
+
+def run(count=20000):
+    saorm.configure_mappers()
+    setup_db()
+    insert_rows(count)
+    plain_time = best_of(lambda: load(Plain))
+    mixin_time = best_of(lambda: load(Family))
+    results = [
+        report('load without mixin', plain_time, count),
+        report('load with mixin', mixin_time, count),
+    ]
+    print('overhead {0:.1f}%'.format((mixin_time - plain_time) * 100 / plain_time))
+    return results
+
+
+if __name__ == '__main__':
+    run()
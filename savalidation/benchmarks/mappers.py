@@ -0,0 +1,64 @@
+"""
+    Measures declaring and configuring many mapped classes using validates_constraints(), which
+    is paid once per process at startup.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+from timeit import default_timer
+
+import sqlalchemy as sa
+import sqlalchemy.ext.declarative as sadec
+import sqlalchemy.orm as saorm
+
+from savalidation import ValidationMixin
+import savalidation.validators as val
+from savalidation.benchmarks import report
+
+
+def _class_attrs(index, columns):
+    attrs = {
+        '__tablename__': 'table_{0}'.format(index),
+        'id': sa.Column(sa.Integer, primary_key=True),
+        '_sav_entity_linkers': [(val.validates_constraints.validator_cls, (), {})],
+    }
+    for i in range(columns):
+        kind = i % 3
+        if kind == 0:
+            attrs['col{0}'.format(i)] = sa.Column(sa.Unicode(50), nullable=False)
+        elif kind == 1:
+            attrs['col{0}'.format(i)] = sa.Column(sa.Integer, nullable=False)
+        else:
+            attrs['col{0}'.format(i)] = sa.Column(sa.Numeric(12, 2))
+    return attrs
+
+
+def declare_and_configure(classes, columns):
+    """ returns the seconds taken to declare and to configure `classes` mapped classes """
+    Base = sadec.declarative_base(metadata=sa.MetaData())
+    start = default_timer()
+    # the registry only keeps weak references to the classes
+    models = [
+        type('Model{0}'.format(index), (Base, ValidationMixin), _class_attrs(index, columns))
+        for index in range(classes)
+    ]
+    declared = default_timer()
+    saorm.configure_mappers()
+    configured = default_timer()
+    assert all('_sav_plan' in model.__dict__ for model in models)
+    registry = getattr(Base, 'registry', None)
+    if registry is not None:
+        registry.dispose()
+    return declared - start, configured - declared
+
+
+def run(classes=500, columns=30, repeat=3):
+    timings = [declare_and_configure(classes, columns) for _ in range(repeat)]
+    return [
+        report('declare {0} classes'.format(classes), min(t[0] for t in timings), classes),
+        report('configure {0} classes'.format(classes), min(t[1] for t in timings), classes),
+    ]
+
+
+if __name__ == '__main__':
+    run()
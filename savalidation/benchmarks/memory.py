@@ -0,0 +1,72 @@
+"""
+    Measures the memory and garbage collection cost of the validation state of loaded rows
+    once they have been validated, for each ValidationMixin._sav_state_backend, compared to
+    rows of the same model without the mixin.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+import gc
+from timeit import default_timer
+
+import sqlalchemy.orm as saorm
+
+from savalidation.benchmarks import report
+from savalidation.benchmarks.load import insert_rows
+from savalidation.benchmarks.models import Family, Plain, Session, setup_db
+
+
+def measure(cls, count, backend=None):
+    """
+        Loads the rows of cls and validates them with the given backend.  Returns the bytes
+        allocated by validation per row, the objects it added for the garbage collector to
+        track per row and the seconds a full collection takes with the rows loaded.
+    """
+    import tracemalloc
+    sess = Session()
+    rows = sess.query(cls).all()
+    gc.collect()
+    tracked_before = len(gc.get_objects())
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        if backend is not None:
+            cls._sav_state_backend = backend
+            # validated the way a flush does, validate_many() doesn't give valid rows a helper
+            for row in rows:
+                row._sav_validate(row, 'before_flush')
+        allocated = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+        if backend is not None:
+            del cls._sav_state_backend
+    tracked = len(gc.get_objects()) - tracked_before
+    start = default_timer()
+    gc.collect()
+    gc_seconds = default_timer() - start
+    sess.close()
+    return allocated / float(count), tracked / float(count), gc_seconds
+
+
+def run(count=1000000):
+    saorm.configure_mappers()
+    setup_db()
+    insert_rows(count)
+    results = []
+    for label, cls, backend in (
+        ('no mixin', Plain, None),
+        ('helper backend', Family, 'helper'),
+        ('instance_state backend', Family, 'instance_state'),
+    ):
+        per_row, tracked, gc_seconds = measure(cls, count, backend)
+        result = report('gc.collect() {0}'.format(label), gc_seconds, count)
+        result['bytes_per_row'] = per_row
+        result['tracked_per_row'] = tracked
+        print('{0:<40} {1:>10.1f} bytes/row {2:>6.2f} gc objects/row'.format(
+            '  validation state', per_row, tracked))
+        results.append(result)
+    return results
+
+
+if __name__ == '__main__':
+    run()
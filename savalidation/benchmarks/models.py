@@ -0,0 +1,106 @@
+from __future__ import absolute_import
+from datetime import datetime
+from decimal import Decimal
+
+import sqlalchemy as sa
+import sqlalchemy.ext.declarative as sadec
+import sqlalchemy.orm as saorm
+import sqlalchemy.sql as sasql
+
+from savalidation import ValidationMixin
+import savalidation.validators as val
+
+engine = sa.create_engine('sqlite://')
+meta = sa.MetaData()
+Base = sadec.declarative_base(metadata=meta)
+
+Session = saorm.sessionmaker(bind=engine, autoflush=False)
+
+
+class Family(Base, ValidationMixin):
+    __tablename__ = 'families'
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    createdts = sa.Column(sa.DateTime, nullable=False, default=datetime.now,
+                          server_default=sasql.text('CURRENT_TIMESTAMP'))
+    updatedts = sa.Column(sa.DateTime, onupdate=datetime.now)
+    name = sa.Column(sa.Unicode(75), nullable=False, unique=True)
+    reg_num = sa.Column(sa.Integer, nullable=False, unique=True)
+    status = sa.Column(sa.Unicode(15), nullable=False, default=u'active', server_default=u'active')
+
+    val.validates_constraints()
+    val.validates_one_of('status', [u'active', u'inactive', u'moved'])
+
+
+class Person(Base, ValidationMixin):
+    __tablename__ = 'people'
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    family_id = sa.Column(sa.Integer, sa.ForeignKey(Family.id), nullable=False)
+    name_first = sa.Column(sa.Unicode(75), nullable=False)
+    name_last = sa.Column(sa.Unicode(75), nullable=False)
+    family_role = sa.Column(sa.Unicode(20), nullable=False)
+    email = sa.Column(sa.String(120))
+    birthdate = sa.Column(sa.Date)
+
+    family = saorm.relationship(Family)
+
+    val.validates_constraints()
+    val.validates_choices('family_role', ((u'father', 'Father'), (u'mother', 'Mother'),
+                                          (u'child', 'Child')))
+    val.validates_email('email')
+    val.converts_date('birthdate')
+
+
+class Plain(Base):
+    """ same columns as Family but without the validation mixin """
+    __tablename__ = 'plain'
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    createdts = sa.Column(sa.DateTime, nullable=False, default=datetime.now,
+                          server_default=sasql.text('CURRENT_TIMESTAMP'))
+    updatedts = sa.Column(sa.DateTime, onupdate=datetime.now)
+    name = sa.Column(sa.Unicode(75), nullable=False, unique=True)
+    reg_num = sa.Column(sa.Integer, nullable=False, unique=True)
+    status = sa.Column(sa.Unicode(15), nullable=False, default=u'active', server_default=u'active')
+
+
+WIDE_COLUMNS = 30
+
+
+def _wide_columns():
+    cols = {'__tablename__': 'wide', 'id': sa.Column(sa.Integer, primary_key=True)}
+    for i in range(WIDE_COLUMNS):
+        kind = i % 3
+        if kind == 0:
+            cols['str{0}'.format(i)] = sa.Column(sa.Unicode(50), nullable=False)
+        elif kind == 1:
+            cols['int{0}'.format(i)] = sa.Column(sa.Integer, nullable=False)
+        else:
+            cols['num{0}'.format(i)] = sa.Column(sa.Numeric(12, 2))
+    cols['_sav_entity_linkers'] = [(val.validates_constraints.validator_cls, (), {})]
+    return cols
+
+
+Wide = type('Wide', (Base, ValidationMixin), _wide_columns())
+
+
+def wide_values(i):
+    values = {}
+    for colname in Wide.__table__.columns.keys():
+        if colname.startswith('str'):
+            values[colname] = u'value {0}'.format(i)
+        elif colname.startswith('int'):
+            values[colname] = i
+        elif colname.startswith('num'):
+            values[colname] = Decimal('1234.56')
+    return values
+
+
+def family_values(i):
+    return dict(name=u'family {0}'.format(i), reg_num=i, status=u'active')
+
+
+def setup_db():
+    meta.drop_all(bind=engine)
+    meta.create_all(bind=engine)
@@ -0,0 +1,83 @@
+"""
+    Compares NumericValidator to the version which worked out its bounds, quantizer and
+    messages on every call.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+from decimal import Decimal, DecimalException
+
+import formencode
+
+from savalidation import _FEState
+from savalidation.benchmarks import best_of, report
+from savalidation.validators import BaseValidator, NumericValidator
+
+
+class PerCallNumericValidator(BaseValidator):
+    """ NumericValidator as it was before the bounds were precomputed """
+    def __init__(self, places, prec):
+        self.places = places
+        self.prec = prec
+        super(PerCallNumericValidator, self).__init__()
+
+    def _to_python(self, value, state):
+        try:
+            return Decimal(value)
+        except DecimalException:
+            raise formencode.Invalid('Please enter a number', value, state)
+
+    def validate_python(self, value, state):
+        super(BaseValidator, self)._validate_python(value, state)
+        if value is None or self.places is None or self.prec is None:
+            return
+        max_before_point = self.places - self.prec
+        if value.adjusted() + 1 > max_before_point:
+            max_val = '{}.{}'.format('9' * max_before_point, '9' * self.prec)
+            if value >= 0:
+                raise formencode.Invalid(
+                    'Please enter a number that is {} or smaller'.format(max_val), state, value
+                )
+            else:
+                raise formencode.Invalid(
+                    'Please enter a number that is -{} or greater'.format(max_val), state, value
+                )
+
+        quant = Decimal('1') / (Decimal('10') ** self.prec) if self.prec else Decimal('0')
+        if value.quantize(quant) != value:
+            raise formencode.Invalid(
+                'Please enter a number with {} or fewer decimal places'.format(self.prec),
+                state, value
+            )
+
+
+def call_many(to_python, value, state, count):
+    for _ in range(count):
+        try:
+            to_python(value, state)
+        except formencode.Invalid:
+            pass
+
+
+def run(count=20000):
+    state = _FEState(None)
+    results = []
+    values = (
+        ('Decimal', Decimal('1234.56')),
+        ('int', 1234),
+        ('str', '1234.56'),
+        ('too big', Decimal('12345678901.00')),
+    )
+    for label, value in values:
+        timings = []
+        for cls in (PerCallNumericValidator, NumericValidator):
+            to_python = cls(12, 2).to_python
+            seconds = best_of(lambda: call_many(to_python, value, state, count))
+            timings.append(seconds)
+            results.append(report('{0}: {1}'.format(cls.__name__, label), seconds, count))
+        print('{0}: speedup {1:.2f}x'.format(label, timings[0] / timings[1]))
+    return results
+
+
+if __name__ == '__main__':
+    run()
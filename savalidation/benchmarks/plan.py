@@ -0,0 +1,57 @@
+"""
+    Compares validating entities with the compiled per-class plan to validating them with a
+    formencode.Schema walk, as was done before the plans existed.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+import formencode
+import sqlalchemy.orm as saorm
+
+from savalidation import _FEState
+from savalidation.benchmarks import best_of, report
+from savalidation.benchmarks.models import Family, Wide, family_values, wide_values
+
+
+def schema_for_entries(entries):
+    """ builds the formencode.Schema equivalent to a tuple of plan entries """
+    schema = formencode.Schema(allow_extra_fields=True)
+    for entry in entries:
+        fevs = [validator.__self__ for validator in reversed(entry.validators)]
+        schema.add_field(entry.key, formencode.compound.All(*fevs))
+    return schema
+
+
+def validate_with_schema(entities, schema):
+    for entity in entities:
+        idict = {}
+        for colname in entity._sav_column_names():
+            if colname in schema.fields:
+                idict[colname] = getattr(entity, colname, None)
+        try:
+            schema.to_python(idict, _FEState(entity))
+        except formencode.Invalid as e:
+            e.unpack_errors()
+
+
+def validate_with_plan(entities):
+    for entity in entities:
+        entity._sav.run_event_schemas('before_flush')
+
+
+def run(count=2000):
+    saorm.configure_mappers()
+    results = []
+    for cls, values in ((Family, family_values), (Wide, wide_values)):
+        entities = [cls(**values(i)) for i in range(count)]
+        schema = schema_for_entries(cls._sav_event_plans['before_flush'][0])
+        schema_time = best_of(lambda: validate_with_schema(entities, schema))
+        plan_time = best_of(lambda: validate_with_plan(entities))
+        results.append(report('{0}: formencode.Schema'.format(cls.__name__), schema_time, count))
+        results.append(report('{0}: compiled plan'.format(cls.__name__), plan_time, count))
+        print('{0}: speedup {1:.2f}x'.format(cls.__name__, schema_time / plan_time))
+    return results
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,106 @@
+"""
+    Runs all of the benchmarks and writes the results to a JSON file so that releases can be
+    compared:
+
+        python -m savalidation.benchmarks.suite results-0.4.2.json
+        python -m savalidation.benchmarks.suite results-new.json --compare results-0.4.2.json
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+import argparse
+import datetime as dt
+import json
+import platform
+import sys
+
+import formencode
+import sqlalchemy as sa
+
+import savalidation
+from savalidation.benchmarks import (batch, flush, imports, load, mappers, memory, numeric,
+                                     plan, validators)
+
+# (benchmark name, module, keyword arguments giving the default sizes)
+BENCHMARKS = (
+    ('flush', flush, dict(count=2000)),
+    ('load', load, dict(count=20000)),
+    ('plan', plan, dict(count=2000)),
+    ('batch', batch, dict(count=5000)),
+    ('validators', validators, dict(count=10000)),
+    ('numeric', numeric, dict(count=20000)),
+    ('mappers', mappers, dict(classes=500)),
+    ('imports', imports, dict(count=5)),
+    # use --only memory --scale 10 for the 1M rows the module defaults to
+    ('memory', memory, dict(count=100000)),
+)
+if not imports.SUPPORTED:
+    BENCHMARKS = tuple(benchmark for benchmark in BENCHMARKS if benchmark[1] is not imports)
+
+
+def environment():
+    return {
+        'savalidation': savalidation.VERSION,
+        'sqlalchemy': sa.__version__,
+        'formencode': getattr(formencode, '__version__', None),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'timestamp': dt.datetime.utcnow().isoformat(),
+    }
+
+
+def run(scale=1.0, only=None):
+    """
+        Runs the benchmarks and returns the results as a dict.  `scale` multiplies the default
+        sizes and `only` limits the run to the named benchmarks.
+    """
+    results = {'environment': environment(), 'benchmarks': {}}
+    for name, module, sizes in BENCHMARKS:
+        if only and name not in only:
+            continue
+        print('--- {0}'.format(name))
+        kwargs = dict((key, max(1, int(value * scale))) for key, value in sizes.items())
+        results['benchmarks'][name] = module.run(**kwargs)
+    return results
+
+
+def compare(baseline, results):
+    """ prints the ratio of each timing in results to the same timing in baseline """
+    for name, timings in sorted(results['benchmarks'].items()):
+        old_timings = dict(
+            (timing['name'], timing) for timing in baseline['benchmarks'].get(name, [])
+        )
+        for timing in timings:
+            old = old_timings.get(timing['name'])
+            if old is None or old['count'] != timing['count']:
+                continue
+            print('{0:<40} {1:>8.2f}x'.format(timing['name'], timing['seconds'] / old['seconds']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='run the savalidation benchmarks')
+    parser.add_argument('output', help='file to write the JSON results to, "-" for stdout')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiplier for the number of entities used by each benchmark')
+    parser.add_argument('--only', action='append', choices=[b[0] for b in BENCHMARKS],
+                        help='run only the named benchmark, can be given more than once')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='JSON results of an earlier run to compare against')
+    args = parser.parse_args(argv)
+
+    results = run(args.scale, args.only)
+    if args.output == '-':
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+    else:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        print('--- compared to {0}'.format(baseline['environment']['savalidation']))
+        compare(baseline, results)
+
+
+if __name__ == '__main__':
+    main()
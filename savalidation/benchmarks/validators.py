@@ -0,0 +1,59 @@
+"""
+    Measures each of the built-in validators and converters in isolation, calling the
+    formencode validator the way a compiled plan does.
+"""
+from __future__ import absolute_import
+from __future__ import print_function
+
+from decimal import Decimal
+
+import formencode
+import formencode.national
+import formencode.validators as fev
+
+from savalidation import _FEState
+import savalidation.validators as val
+from savalidation.benchmarks import best_of, report
+
+
+def validator_cases():
+    """ returns (name, formencode validator, value) tuples, one for each built-in validator """
+    codes = [u'SKU{0:05d}'.format(i) for i in range(50000)]
+    return [
+        ('presence_of', formencode.FancyValidator(not_empty=True), u'value'),
+        ('one_of', val._OneOf([u'active', u'inactive', u'moved']), u'moved'),
+        ('one_of 50k choices', val._OneOf(codes), codes[-1]),
+        ('minlen', val._MinLength(5), u'abcdefgh'),
+        ('ipaddr', val._IPAddress(), '192.168.1.1'),
+        ('url', val._URL(), 'http://www.example.com/path'),
+        ('email', fev.Email(), 'someone@example.com'),
+        ('usphone', formencode.national.USPhoneNumber(), '502-555-1234'),
+        ('constraints: max length', fev.MaxLength(75), u'a family name'),
+        ('constraints: numeric', val.NumericValidator(12, 2), Decimal('1234.56')),
+        ('constraints: int', fev.Int(), 12345),
+        ('converts_date', val.DateConverter(), '05/12/2010'),
+        ('converts_date cached', val.DateConverter(cache_size=100), '05/12/2010'),
+        ('converts_time', val.TimeConverter(use_datetime=True), '10:47:35 pm'),
+        ('converts_datetime', val.DateTimeConverter(), '2010-09-12 10:47:35 pm'),
+        ('converts_datetime iso', val.DateTimeConverter(), '2010-09-12T22:47:35'),
+        ('converts_datetime cached', val.DateTimeConverter(cache_size=100),
+         '2010-09-12 10:47:35 pm'),
+    ]
+
+
+def call_many(to_python, value, state, count):
+    for _ in range(count):
+        to_python(value, state)
+
+
+def run(count=10000):
+    state = _FEState(None)
+    results = []
+    for name, validator, value in validator_cases():
+        seconds = best_of(lambda: call_many(validator.to_python, value, state, count))
+        results.append(report('validator {0}'.format(name), seconds, count))
+    return results
+
+
+if __name__ == '__main__':
+    run()
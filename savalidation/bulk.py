@@ -0,0 +1,122 @@
+"""
+    Validation for SQLAlchemy's bulk operations.  Session.bulk_save_objects(),
+    bulk_insert_mappings() and bulk_update_mappings() don't fire the mapper events
+    savalidation relies on, so nothing is validated unless one of the following is used:
+
+        class ValidatingSession(BulkValidationMixin, Session):
+            pass
+
+        # SQLAlchemy 1.4+, session.execute(insert(Model), [...]) and update(Model)
+        watch_bulk_statements(ValidatingSession)
+
+    Rows are validated against the classes' compiled plans for both validation events before
+    anything is sent to the database and a BulkValidationError naming the invalid rows is
+    raised if any of them fail.
+"""
+from __future__ import absolute_import
+from collections import defaultdict
+
+import sqlalchemy as sa
+import sqlalchemy.orm as saorm
+
+from savalidation import BulkValidationError, ValidationMixin, _apply_plan, _FEState
+from savalidation.validators import FEVMeta
+
+
+def _validation_class(mapper):
+    cls = sa.inspect(mapper).class_
+    if not getattr(cls, '_sav_do_validation', False):
+        return None
+    if not hasattr(cls, '_sav_event_plans'):
+        saorm.configure_mappers()
+    return cls
+
+
+def validate_mappings(mapper, mappings, partial=False):
+    """
+        Validates a list of mappings, as given to bulk_insert_mappings(), for the mapped class
+        or mapper.  With partial=True, as for updates, only the keys present in each mapping
+        are validated.  Converted values are written back to the mappings.
+    """
+    cls = _validation_class(mapper)
+    if cls is None:
+        return
+    plan_groups = []
+    for event in FEVMeta.ALL_EVENTS:
+        val_entries, conv_entries = cls._sav_event_plans[event]
+        plan_groups.append((val_entries, False))
+        plan_groups.append((conv_entries, True))
+
+    row_errors = {}
+    for index, mapping in enumerate(mappings):
+        state = _FEState(mapping)
+        field_names = mapping if partial else None
+        for entries, flag_convert in plan_groups:
+            failures, converted = _apply_plan(mapping, dict.get, entries, flag_convert, state,
+                                              field_names)
+            if failures:
+                errors = row_errors.setdefault(index, defaultdict(list))
+                for key, msg in failures:
+                    errors[key].append(msg)
+            elif converted and index not in row_errors:
+                # mappings SA hands out can be immutable, those are left unconverted
+                try:
+                    mapping.update(converted)
+                except TypeError:
+                    pass
+    if row_errors:
+        raise BulkValidationError(row_errors, mappings)
+
+
+def validate_objects(objects):
+    """
+        Validates a list of instances, as given to bulk_save_objects(), the same way a flush
+        would validate them.
+    """
+    row_errors = ValidationMixin.validate_many(objects, ('before_flush', 'before_exec'))
+    if row_errors:
+        raise BulkValidationError(row_errors, objects)
+
+
+class BulkValidationMixin(object):
+    """
+        Mix into a Session class to have its bulk operations validated first.
+    """
+
+    def bulk_save_objects(self, objects, *args, **kwargs):
+        objects = list(objects)
+        validate_objects(objects)
+        return super(BulkValidationMixin, self).bulk_save_objects(objects, *args, **kwargs)
+
+    def bulk_insert_mappings(self, mapper, mappings, *args, **kwargs):
+        mappings = list(mappings)
+        validate_mappings(mapper, mappings)
+        return super(BulkValidationMixin, self).bulk_insert_mappings(mapper, mappings, *args,
+                                                                     **kwargs)
+
+    def bulk_update_mappings(self, mapper, mappings, *args, **kwargs):
+        mappings = list(mappings)
+        validate_mappings(mapper, mappings, partial=True)
+        return super(BulkValidationMixin, self).bulk_update_mappings(mapper, mappings, *args,
+                                                                     **kwargs)
+
+
+def _validate_orm_execute(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update):
+        return
+    mapper = orm_execute_state.bind_mapper
+    params = orm_execute_state.parameters
+    if mapper is None or not params:
+        return
+    if isinstance(params, dict):
+        params = [params]
+    validate_mappings(mapper, params, partial=orm_execute_state.is_update)
+
+
+def watch_bulk_statements(target):
+    """
+        Validates the parameters of ORM enabled INSERT and UPDATE statements executed through
+        sessions of `target` (a Session class, sessionmaker or Session).  Needs the
+        do_orm_execute event added in SQLAlchemy 1.4.
+    """
+    sa.event.listen(target, 'do_orm_execute', _validate_orm_execute)
@@ -0,0 +1,251 @@
+"""
+    Opt-in timing and counters for validation, to find out whether (and which) validation is
+    what makes a flush slow.
+
+        import savalidation.stats
+
+        savalidation.stats.enable()
+        ... flush some entities ...
+        for key, timing in savalidation.stats.snapshot().items():
+            print(key.model, key.field, key.validator, key.event, timing)
+
+    Timings are kept per StatsKey(model, field, validator, event):
+
+        - one key per field validator, e.g. ('Family', 'status', '_OneOf', 'before_flush')
+        - ('Family', None, '_sav_validate', event) for validating an instance as a whole
+        - ('Family', None, 'run_event_schemas', event) for running an instance's validators
+        - ('Family', None, '<method name>', 'before_flush') for each before_flush method
+
+    Each timing is also sent to the listeners of the 'validation_timed' event, e.g. to
+    export them to a metrics system:
+
+        @sa.event.listens_for(savalidation.stats.collector, 'validation_timed')
+        def send_timing(key, seconds, failed):
+            ...
+
+    Nothing is wrapped until enable() is called and disable() puts the original methods and
+    validators back, so there is no overhead while instrumentation is disabled.
+"""
+from __future__ import absolute_import
+
+from collections import namedtuple
+import threading
+from timeit import default_timer
+
+import formencode
+import sqlalchemy as sa
+import sqlalchemy.orm as saorm
+
+from savalidation import ValidationMixin, _ValidationHelper
+
+StatsKey = namedtuple('StatsKey', 'model field validator event')
+
+
+class Timing(object):
+    """ counters for one StatsKey """
+    __slots__ = ('calls', 'errors', 'total_time', 'max_time')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_time': self.total_time,
+            'max_time': self.max_time,
+        }
+
+    def __repr__(self):
+        return '<Timing calls={0} errors={1} total_time={2:.6f} max_time={3:.6f}>'.format(
+            self.calls, self.errors, self.total_time, self.max_time
+        )
+
+
+class StatsCollector(object):
+    """ holds the timings, the module level `collector` is the one used """
+
+    def __init__(self):
+        self.enabled = False
+        self.timings = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, seconds, failed):
+        with self._lock:
+            timing = self.timings.get(key)
+            if timing is None:
+                timing = self.timings[key] = Timing()
+            timing.calls += 1
+            if failed:
+                timing.errors += 1
+            timing.total_time += seconds
+            if seconds > timing.max_time:
+                timing.max_time = seconds
+        if self.dispatch.validation_timed:
+            self.dispatch.validation_timed(key, seconds, failed)
+
+
+class StatsEvents(sa.event.Events):
+    """ events fired by a StatsCollector """
+    _dispatch_target = StatsCollector
+
+    def validation_timed(self, key, seconds, failed):
+        """
+            Called after each timed call while instrumentation is enabled.  `key` is the
+            StatsKey the timing was recorded under and `failed` is True when the call produced a
+            validation error.
+        """
+
+
+collector = StatsCollector()
+
+# the uninstrumented methods, while instrumentation is enabled
+_originals = {}
+
+
+def _classes_with_plans():
+    """ the mapped classes which compiled their own plan, subclasses can share a parent's """
+    pending = [ValidationMixin]
+    seen = set()
+    while pending:
+        cls = pending.pop()
+        for subcls in cls.__subclasses__():
+            if subcls in seen:
+                continue
+            seen.add(subcls)
+            pending.append(subcls)
+            # classes can be left behind by clear_mappers() or registry.dispose()
+            if '_sav_plan' in subcls.__dict__ and getattr(subcls, '__mapper__', None):
+                yield subcls
+
+
+def _timed_validator(key, to_python):
+    def timed_to_python(value, state):
+        failed = False
+        start = default_timer()
+        try:
+            return to_python(value, state)
+        except formencode.Invalid:
+            failed = True
+            raise
+        finally:
+            collector.record(key, default_timer() - start, failed)
+    timed_to_python.sav_wrapped = to_python
+    return timed_to_python
+
+
+def _instrument_class(cls):
+    if '_sav_uninstrumented_plan' in cls.__dict__:
+        return
+    model = cls.__name__
+    plan = []
+    for entry in cls._sav_plan:
+        validators = tuple(
+            _timed_validator(
+                StatsKey(model, entry.key, type(to_python.__self__).__name__, entry.event),
+                to_python,
+            )
+            for to_python in entry.validators
+        )
+        plan.append(entry._replace(validators=validators))
+    cls._sav_uninstrumented_plan = cls._sav_plan
+    cls._sav_set_plan(tuple(plan))
+
+
+def _restore_class(cls):
+    plan = cls.__dict__.get('_sav_uninstrumented_plan')
+    if plan is None:
+        return
+    del cls._sav_uninstrumented_plan
+    cls._sav_set_plan(plan)
+
+
+def _timed_sav_validate(cls, instance, type):
+    start = default_timer()
+    try:
+        return _originals['_sav_validate'].__func__(cls, instance, type)
+    finally:
+        key = StatsKey(instance.__class__.__name__, None, '_sav_validate', type)
+        collector.record(key, default_timer() - start, instance._sav.has_errors)
+
+
+def _timed_run_event_schemas(helper, event):
+    start = default_timer()
+    has_error = False
+    try:
+        has_error = _originals['run_event_schemas'](helper, event)
+        return has_error
+    finally:
+        key = StatsKey(helper.entity.__class__.__name__, None, 'run_event_schemas', event)
+        collector.record(key, default_timer() - start, has_error)
+
+
+def _timed_trigger_before_flush_methods(helper):
+    entity = helper.entity
+    model = entity.__class__.__name__
+    for mname in helper.before_flush_methods:
+        method_obj = getattr(entity, mname)
+        errors_before = helper.has_errors
+        start = default_timer()
+        try:
+            method_obj()
+        finally:
+            key = StatsKey(model, None, mname, 'before_flush')
+            collector.record(key, default_timer() - start,
+                             helper.has_errors and not errors_before)
+
+
+def _instrument_configured_class(mapper, cls):
+    # for classes configured after instrumentation was enabled
+    if collector.enabled and '_sav_plan' in cls.__dict__:
+        _instrument_class(cls)
+
+
+def enable():
+    """ starts timing validation, the timings recorded so far are kept """
+    if collector.enabled:
+        return
+    _originals['_sav_validate'] = ValidationMixin.__dict__['_sav_validate']
+    _originals['run_event_schemas'] = _ValidationHelper.__dict__['run_event_schemas']
+    _originals['trigger_before_flush_methods'] = \
+        _ValidationHelper.__dict__['trigger_before_flush_methods']
+    ValidationMixin._sav_validate = classmethod(_timed_sav_validate)
+    _ValidationHelper.run_event_schemas = _timed_run_event_schemas
+    _ValidationHelper.trigger_before_flush_methods = _timed_trigger_before_flush_methods
+    for cls in _classes_with_plans():
+        _instrument_class(cls)
+    sa.event.listen(saorm.mapper, 'mapper_configured', _instrument_configured_class)
+    collector.enabled = True
+
+
+def disable():
+    """ stops timing validation and removes all the instrumentation """
+    if not collector.enabled:
+        return
+    collector.enabled = False
+    sa.event.remove(saorm.mapper, 'mapper_configured', _instrument_configured_class)
+    for cls in _classes_with_plans():
+        _restore_class(cls)
+    ValidationMixin._sav_validate = _originals.pop('_sav_validate')
+    _ValidationHelper.run_event_schemas = _originals.pop('run_event_schemas')
+    _ValidationHelper.trigger_before_flush_methods = \
+        _originals.pop('trigger_before_flush_methods')
+
+
+def is_enabled():
+    return collector.enabled
+
+
+def snapshot():
+    """ returns a dict mapping each StatsKey to a dict of its counters """
+    with collector._lock:
+        return dict((key, timing.as_dict()) for key, timing in collector.timings.items())
+
+
+def reset():
+    """ forgets all the timings recorded so far """
+    with collector._lock:
+        collector.timings = {}
@@ -0,0 +1,79 @@
+"""
+    Models with async validators, kept apart from examples.py since they need Python 3.5+
+"""
+from __future__ import absolute_import
+import asyncio
+
+import formencode
+import sqlalchemy as sa
+import sqlalchemy.ext.declarative as sadec
+
+from savalidation import ValidationError, ValidationMixin
+import savalidation.aio as aio
+import savalidation.validators as val
+
+meta = sa.MetaData()
+Base = sadec.declarative_base(metadata=meta)
+
+# what the fake remote service knows about
+REGISTERED_DOMAINS = {'example.com', 'example.org'}
+BLOCKED_NAMES = {'mallory'}
+
+# the number of lookups in progress, to show they run concurrently
+lookups = {'running': 0, 'most': 0}
+
+
+async def remote_lookup(result):
+    lookups['running'] += 1
+    lookups['most'] = max(lookups['most'], lookups['running'])
+    await asyncio.sleep(0.01)
+    lookups['running'] -= 1
+    return result
+
+
+class Account(Base, ValidationMixin):
+    __tablename__ = 'accounts'
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    name = sa.Column(sa.Unicode(50), nullable=False)
+    email = sa.Column(sa.Unicode(100))
+
+    val.validates_constraints()
+
+    @aio.validates('email')
+    async def email_domain_registered(self, field_name, value):
+        domain = value.split('@')[-1] if value else None
+        if value and not await remote_lookup(domain in REGISTERED_DOMAINS):
+            raise formencode.Invalid('unknown domain', value, None)
+
+    @aio.before_flush
+    async def name_not_blocked(self):
+        if await remote_lookup(self.name in BLOCKED_NAMES):
+            self.add_validation_error('name', 'blocked')
+
+
+async def flush_with_async_session(accounts, valid_accounts):
+    """
+        Flushes `accounts` with an AsyncSession, then commits `valid_accounts` after rolling
+        back.  Returns the ValidationError of the first flush and the number of rows saved.
+        The coroutines of the tests live here so test_aio.py can be collected on Python 2.
+    """
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    error = None
+    engine = create_async_engine('sqlite+aiosqlite://', poolclass=sa.pool.StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(meta.create_all)
+    async with AsyncSession(engine) as sess:
+        sess.add_all(accounts)
+        try:
+            await sess.flush()
+        except ValidationError as e:
+            await sess.rollback()
+            error = e
+
+        sess.add_all(valid_accounts)
+        await sess.commit()
+        result = await sess.execute(sa.select(sa.func.count(Account.id)))
+        count = result.scalar()
+    await engine.dispose()
+    return error, count
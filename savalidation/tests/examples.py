@@ -123,6 +123,42 @@ class DateTimeType(Base, ValidationMixin):
     val.converts_time('fld3')
 
 
+class CachedDateTimeType(Base, ValidationMixin):
+    __tablename__ = 'CachedDateTimeType'
+    id = sa.Column(sa.Integer, primary_key=True)
+    fld = sa.Column(sa.Date)
+    fld2 = sa.Column(sa.DateTime)
+    fld3 = sa.Column(sa.Time)
+
+    val.converts_date('fld', cache_size=2)
+    val.converts_datetime('fld2', cache_size=2)
+    val.converts_time('fld3')
+
+
+PRODUCT_CODES = [u'a1', u'b2']
+PRODUCT_CATEGORIES = [(u'tools', 'Tools'), (u'toys', 'Toys')]
+
+
+class Product(Base, ValidationMixin):
+    __tablename__ = 'products'
+    id = sa.Column(sa.Integer, primary_key=True)
+    code = sa.Column(sa.Unicode(10))
+    category = sa.Column(sa.Unicode(10))
+
+    val.validates_one_of('code', lambda: PRODUCT_CODES)
+    val.validates_choices('category', lambda: PRODUCT_CATEGORIES)
+
+
+class Registration(Base, ValidationMixin):
+    __tablename__ = 'registrations'
+    id = sa.Column(sa.Integer, primary_key=True)
+    code = sa.Column(sa.Unicode(10), nullable=False, unique=True)
+    email = sa.Column(sa.Unicode(50), unique=True)
+
+    val.validates_constraints()
+    val.validates_unique('code', 'email', chunk_size=2)
+
+
 class Customer(Base, ValidationMixin):
     __tablename__ = 'customer'
 
@@ -155,6 +191,17 @@ class Order(Base, ValidationMixin):
     val.validates_constraints()
 
 
+class Invoice(Base, ValidationMixin):
+    __tablename__ = 'invoices'
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    customer_id = sa.Column(sa.Integer, sa.ForeignKey(Customer.id))
+    order_id = sa.Column(sa.Integer, sa.ForeignKey('orders.id'))
+
+    val.validates_references('customer_id', cache_size=10, cache_ttl=60, chunk_size=2)
+    val.validates_references('order_id')
+
+
 class Order2(Base, ValidationMixin):
     __tablename__ = 'orders2'
 
@@ -203,6 +250,28 @@ validates_reverse = val.formencode_factory(ReverseConverter)
 converts_reverse = val.formencode_factory(ReverseConverter, sv_convert=True)
 
 
+class DiffersFromName(val.BaseValidator):
+    def _to_python(self, value, state):
+        # the other values are only available from state.full_dict, like in a Schema
+        if value is not None and value == state.full_dict.get('name'):
+            raise formencode.Invalid('Must differ from the name', value, state)
+        return value
+
+
+validates_differs_from_name = val.formencode_factory(DiffersFromName)
+
+
+class FullDictTester(Base, ValidationMixin):
+    __tablename__ = 'full_dict_testers'
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    name = sa.Column(sa.Unicode(20))
+    nickname = sa.Column(sa.Unicode(20))
+
+    val.validates_minlen('name', 2)
+    validates_differs_from_name('nickname')
+
+
 class ConversionTester(Base, ValidationMixin):
     __tablename__ = 'conversion_testers'
 
@@ -217,4 +286,52 @@ class ConversionTester(Base, ValidationMixin):
     converts_reverse('val3')
     converts_reverse('val4', sv_convert=False)
 
+
+class DirtyOnly(Base, ValidationMixin):
+    __tablename__ = 'dirty_only'
+    _sav_validate_dirty_only = True
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    name = sa.Column(sa.Unicode(20), nullable=False)
+    nickname = sa.Column(sa.Unicode(20))
+    ipaddr = sa.Column(sa.String(15))
+
+    val.validates_constraints()
+    val.validates_minlen('nickname', 5, sav_depends_on='name')
+    val.validates_ipaddr('ipaddr')
+
+
+class SkipUnchanged(Base, ValidationMixin):
+    __tablename__ = 'skip_unchanged'
+    _sav_skip_unchanged = True
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    name = sa.Column(sa.Unicode(20), nullable=False)
+    notes = sa.Column(sa.UnicodeText)
+    qty = sa.Column(sa.Integer)
+
+    val.validates_constraints()
+    val.validates_one_of('qty', [-1, 5])
+
+    before_flush_calls = 0
+
+    @before_flush
+    def count_before_flush(self):
+        self.before_flush_calls += 1
+
+
+class ValidateOnSet(Base, ValidationMixin):
+    __tablename__ = 'validate_on_set'
+    _sav_validate_on_set = True
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    name = sa.Column(sa.Unicode(20), nullable=False)
+    nickname = sa.Column(sa.Unicode(20))
+    created = sa.Column(sa.DateTime)
+
+    val.validates_constraints()
+    val.validates_minlen('nickname', 5, sav_depends_on='name')
+    val.converts_datetime('created')
+
+
 meta.create_all(bind=engine)
@@ -0,0 +1,84 @@
+from __future__ import absolute_import
+
+from nose.plugins.skip import SkipTest
+from nose.tools import eq_
+import sqlalchemy as sa
+import sqlalchemy.orm as saorm
+
+from savalidation import ValidationError
+
+try:
+    import savalidation.tests.aio_examples as aex
+    import sqlalchemy.ext.asyncio  # noqa
+    import aiosqlite  # noqa
+except (ImportError, SyntaxError):
+    aex = None
+
+
+class TestAsync(object):
+
+    @classmethod
+    def setup_class(cls):
+        if aex is None:
+            raise SkipTest('needs Python 3, SQLAlchemy 1.4+ and aiosqlite')
+        saorm.configure_mappers()
+
+    def setUp(self):
+        aex.lookups['most'] = 0
+
+    def run_async(self, coro):
+        import asyncio
+        return asyncio.run(coro)
+
+    def accounts(self):
+        return [
+            aex.Account(name=u'alice', email=u'alice@example.com'),
+            aex.Account(name=u'mallory', email=u'mallory@example.com'),
+            aex.Account(name=u'bob', email=u'bob@example.net'),
+            aex.Account(name=u'carol', email=None),
+        ]
+
+    def check_errors(self, accounts, exc):
+        eq_(exc.invalid_instances, [accounts[1], accounts[2]])
+        eq_(accounts[1].validation_errors, {'name': ['blocked']})
+        eq_(accounts[2].validation_errors, {'email': ['unknown domain']})
+        # the lookups ran at the same time
+        eq_(aex.lookups['most'], 7)
+
+    def test_async_session(self):
+        accounts = self.accounts()
+        e, count = self.run_async(aex.flush_with_async_session(
+            accounts, accounts[:1] + accounts[3:]))
+        assert e is not None, 'expected exception'
+        self.check_errors(accounts, e)
+        eq_(count, 2)
+
+    def test_sync_session(self):
+        engine = sa.create_engine('sqlite://')
+        aex.meta.create_all(bind=engine)
+        sess = saorm.Session(bind=engine)
+        accounts = self.accounts()
+        sess.add_all(accounts)
+        try:
+            sess.flush()
+            assert False, 'expected exception'
+        except ValidationError as e:
+            sess.rollback()
+            self.check_errors(accounts, e)
+        sess.close()
+
+    def test_sync_errors_kept(self):
+        account = aex.Account(name=None, email=u'someone@example.net')
+        engine = sa.create_engine('sqlite://')
+        aex.meta.create_all(bind=engine)
+        sess = saorm.Session(bind=engine)
+        sess.add(account)
+        try:
+            sess.flush()
+            assert False, 'expected exception'
+        except ValidationError as e:
+            sess.rollback()
+            eq_(e.invalid_instances, [account])
+            eq_(account.validation_errors,
+                {'name': ['Please enter a value'], 'email': ['unknown domain']})
+        sess.close()
@@ -0,0 +1,40 @@
+from __future__ import absolute_import
+import json
+
+from nose.plugins.skip import SkipTest
+from nose.tools import eq_
+
+from savalidation.benchmarks import imports, suite
+
+
+class TestSuite(object):
+
+    def test_run(self):
+        # a tiny run to make sure the benchmarks keep working as the library changes
+        results = suite.run(scale=0.005)
+        eq_(sorted(results['benchmarks'].keys()), sorted(b[0] for b in suite.BENCHMARKS))
+        for timings in results['benchmarks'].values():
+            assert timings
+            for timing in timings:
+                assert timing['seconds'] >= 0
+        # must round trip through JSON
+        eq_(json.loads(json.dumps(results)), results)
+
+
+class TestImports(object):
+
+    @classmethod
+    def setup_class(cls):
+        if not imports.SUPPORTED:
+            raise SkipTest('python -X importtime needs Python 3.7+')
+
+    def test_lazy_modules_not_imported(self):
+        times = imports.import_times()
+        assert 'savalidation' in times, times
+        for module in imports.LAZY_MODULES:
+            assert module not in times, '{0} imported with savalidation'.format(module)
+
+    def test_import_time(self):
+        # generous, importing takes a few tens of milliseconds even without bytecode caches
+        times = imports.import_times()
+        assert times['savalidation'][1] < 0.5, times['savalidation']
@@ -0,0 +1,97 @@
+from __future__ import absolute_import
+from datetime import date
+
+from nose.plugins.skip import SkipTest
+from nose.tools import eq_
+import sqlalchemy as sa
+import sqlalchemy.orm as saorm
+
+from savalidation import BulkValidationError
+from savalidation.bulk import BulkValidationMixin, watch_bulk_statements
+import savalidation.tests.examples as ex
+
+
+class ValidatingSession(BulkValidationMixin, saorm.Session):
+    pass
+
+
+Session = saorm.sessionmaker(bind=ex.engine, class_=ValidatingSession)
+
+
+class TestBulk(object):
+
+    def setUp(self):
+        self.sess = Session()
+
+    def tearDown(self):
+        self.sess.rollback()
+        self.sess.query(ex.Family).delete()
+        self.sess.query(ex.DateTimeType).delete()
+        self.sess.commit()
+        self.sess.close()
+
+    def test_insert_mappings(self):
+        mappings = [
+            dict(name=u'f1', reg_num=1),
+            dict(name=u'f2'),
+            dict(name=u'f3', reg_num=3, status=u'foobar'),
+        ]
+        try:
+            self.sess.bulk_insert_mappings(ex.Family, mappings)
+            assert False, 'expected exception'
+        except BulkValidationError as e:
+            eq_(sorted(e.row_errors.keys()), [1, 2])
+            eq_(e.row_errors[1], {'reg_num': [u'Please enter a value']})
+            eq_(e.invalid_instances, [mappings[1], mappings[2]])
+            eq_([invalid.identity for invalid in e.errors], [1, 2])
+            assert str(e).startswith(
+                'validation error(s): row 1 [reg_num: "Please enter a value"]; row 2 [status: '
+            ), str(e)
+            eq_(e.args, (str(e),))
+        eq_(self.sess.query(ex.Family).count(), 0)
+
+        self.sess.bulk_insert_mappings(ex.Family, mappings[:1])
+        eq_(self.sess.query(ex.Family).count(), 1)
+
+    def test_insert_mappings_converted(self):
+        mappings = [dict(fld='9/23/2010')]
+        self.sess.bulk_insert_mappings(ex.DateTimeType, mappings)
+        eq_(mappings[0]['fld'], date(2010, 9, 23))
+        eq_(self.sess.query(ex.DateTimeType).one().fld, date(2010, 9, 23))
+
+    def test_update_mappings(self):
+        self.sess.bulk_insert_mappings(ex.Family, [dict(id=1, name=u'f1', reg_num=1)])
+        # only the keys given are validated
+        self.sess.bulk_update_mappings(ex.Family, [dict(id=1, status=u'moved')])
+        try:
+            self.sess.bulk_update_mappings(ex.Family, [dict(id=1, name=None)])
+            assert False, 'expected exception'
+        except BulkValidationError as e:
+            eq_(e.row_errors, {0: {'name': [u'Please enter a value']}})
+
+    def test_save_objects(self):
+        objects = [ex.Family(name=u'f1', reg_num=1), ex.Family(reg_num=2)]
+        try:
+            self.sess.bulk_save_objects(objects)
+            assert False, 'expected exception'
+        except BulkValidationError as e:
+            eq_(e.row_errors, {1: {'name': [u'Please enter a value']}})
+            eq_(e.invalid_instances, [objects[1]])
+            assert objects[1].validation_errors
+        eq_(self.sess.query(ex.Family).count(), 0)
+
+    def test_orm_statements(self):
+        if not hasattr(saorm, 'ORMExecuteState'):
+            raise SkipTest('needs SQLAlchemy 1.4+')
+        watch_bulk_statements(self.sess)
+        try:
+            self.sess.execute(sa.insert(ex.Family), [dict(name=u'f1', reg_num=1), dict()])
+            assert False, 'expected exception'
+        except BulkValidationError as e:
+            eq_(list(e.row_errors.keys()), [1])
+        try:
+            self.sess.execute(sa.update(ex.Family), [dict(id=1, name=u'f1' * 50)])
+            assert False, 'expected exception'
+        except BulkValidationError as e:
+            eq_(e.row_errors, {0: {'name': [u'Enter a value less than 75 characters long']}})
+        eq_(self.sess.query(ex.Family).count(), 0)
@@ -1,11 +1,19 @@
 from __future__ import absolute_import
+from datetime import datetime
+import time
+
+import formencode
 import six
 import mock
+from nose.plugins.skip import SkipTest
 from nose.tools import eq_, raises
+import sqlalchemy as sa
 import sqlalchemy.exc as saexc
 
+import savalidation
 import savalidation.tests.examples as ex
-from savalidation import ValidationError
+import savalidation.validators as val
+from savalidation import InvalidInstance, ValidationError, ValidationMixin, _ValidationHelper
 
 
 class TestFamily(object):
@@ -15,6 +23,9 @@ class TestFamily(object):
         ex.sess.rollback()
         ex.sess.query(ex.Family).delete()
         ex.sess.commit()
+        # instances from a failed flush can outlive the test, don't let the identity map
+        # hand them to the next test when SQLite reuses their ids
+        ex.sess.remove()
 
     def test_id_is_auto_increment(self):
         f1 = ex.Family(name=u'f1', reg_num=1)
@@ -447,3 +458,691 @@ class TestConversions(object):
             eq_(len(e.invalid_instances), 1)
             expect = {'val3': [u"Must be a string type"]}
             eq_(e1.validation_errors, expect)
+
+
+class TestFullDict(object):
+
+    def tearDown(self):
+        ex.sess.rollback()
+        ex.sess.execute('DELETE FROM %s' % ex.FullDictTester.__table__)
+        ex.sess.commit()
+
+    def test_ok(self):
+        ex.sess.add(ex.FullDictTester(name=u'joe', nickname=u'jo'))
+        ex.sess.commit()
+
+    def test_other_values(self):
+        ftr = ex.FullDictTester(name=u'joe', nickname=u'joe')
+        ex.sess.add(ftr)
+        try:
+            ex.sess.commit()
+            assert False
+        except ValidationError:
+            eq_(ftr.validation_errors, {'nickname': [u'Must differ from the name']})
+
+
+class TestDirtyOnly(object):
+
+    def setUp(self):
+        # rows are inserted directly so that they can start out invalid
+        ex.sess.execute(ex.DirtyOnly.__table__.insert().values(
+            id=1, name=u'joe', nickname=u'jo', ipaddr='foo'
+        ))
+        ex.sess.commit()
+        ex.sess.remove()
+
+    def tearDown(self):
+        ex.sess.rollback()
+        ex.sess.execute(ex.DirtyOnly.__table__.delete())
+        ex.sess.commit()
+        ex.sess.remove()
+
+    def test_new_instances_fully_validated(self):
+        do = ex.DirtyOnly(nickname=u'jo')
+        ex.sess.add(do)
+        try:
+            ex.sess.commit()
+            assert False, 'exception expected'
+        except ValidationError:
+            ex.sess.rollback()
+            expect = {
+                'name': [u'Please enter a value'],
+                'nickname': [u'Enter a value at least 5 characters long'],
+            }
+            eq_(do.validation_errors, expect)
+
+    def test_unchanged_fields_skipped(self):
+        do = ex.sess.query(ex.DirtyOnly).get(1)
+        do.name = u'joseph'
+        do.nickname = u'joey!'
+        ex.sess.commit()
+        eq_(do.validation_errors, {})
+
+    def test_changed_field_validated(self):
+        do = ex.sess.query(ex.DirtyOnly).get(1)
+        do.nickname = u'joey!'
+        do.ipaddr = '127.0.0'
+        try:
+            ex.sess.commit()
+            assert False, 'exception expected'
+        except ValidationError:
+            ex.sess.rollback()
+            eq_(do.validation_errors, {'ipaddr': [u'Please enter a valid IP address (a.b.c.d)']})
+
+    def test_dependent_field_validated(self):
+        do = ex.sess.query(ex.DirtyOnly).get(1)
+        do.name = u'joseph'
+        try:
+            ex.sess.commit()
+            assert False, 'exception expected'
+        except ValidationError:
+            ex.sess.rollback()
+            eq_(do.validation_errors,
+                {'nickname': [u'Enter a value at least 5 characters long']})
+
+
+class TestSkipUnchanged(object):
+
+    def setUp(self):
+        self.su = ex.SkipUnchanged(name=u'joe')
+        ex.sess.add(self.su)
+        ex.sess.commit()
+
+    def tearDown(self):
+        ex.sess.rollback()
+        ex.sess.execute(ex.SkipUnchanged.__table__.delete())
+        ex.sess.commit()
+        ex.sess.remove()
+
+    def flush_counting_runs(self):
+        orig = _ValidationHelper.run_event_schemas
+        with mock.patch.object(_ValidationHelper, 'run_event_schemas', autospec=True,
+                               side_effect=orig) as m_run:
+            ex.sess.flush()
+        return len([c for c in m_run.call_args_list if c[0][1] == 'before_flush'])
+
+    def test_unchanged_skipped(self):
+        assert self.su._sav.fingerprint is not None
+        self.su.notes = u'only an unvalidated column changed'
+        eq_(self.flush_counting_runs(), 0)
+        # before_flush methods still run by default
+        eq_(self.su.before_flush_calls, 2)
+
+    def test_changed_validated(self):
+        self.su.name = u'joseph'
+        eq_(self.flush_counting_runs(), 1)
+        self.su.name = None
+        try:
+            ex.sess.flush()
+            assert False, 'exception expected'
+        except ValidationError:
+            ex.sess.rollback()
+            eq_(self.su._sav.fingerprint, None)
+            eq_(self.su.validation_errors, {'name': [u'Please enter a value']})
+        # validated again after the errors, even though the values are the same
+        self.su.name = u'joseph'
+        eq_(self.flush_counting_runs(), 1)
+
+    def test_before_flush_methods_skipped(self):
+        with mock.patch.object(ex.SkipUnchanged, '_sav_skip_runs_before_flush', False):
+            self.su.notes = u'only an unvalidated column changed'
+            eq_(self.flush_counting_runs(), 0)
+            eq_(self.su.before_flush_calls, 1)
+
+    def test_equal_hashes_validated(self):
+        # hash(-1) == hash(-2)
+        self.su.qty = -1
+        eq_(self.flush_counting_runs(), 1)
+        self.su.qty = -2
+        try:
+            ex.sess.flush()
+            assert False, 'exception expected'
+        except ValidationError:
+            ex.sess.rollback()
+            eq_(list(self.su.validation_errors.keys()), ['qty'])
+
+    def test_types_compared(self):
+        self.su.qty = 1
+        fingerprint = self.su._sav.fingerprint_values()
+        for value in (1.0, True):
+            self.su.qty = value
+            assert self.su._sav.fingerprint_values() != fingerprint, value
+
+    def test_non_scalar_values_validated(self):
+        with mock.patch.object(_ValidationHelper, 'fingerprint_values', return_value=None):
+            self.su.notes = u'only an unvalidated column changed'
+            eq_(self.flush_counting_runs(), 1)
+
+
+class TestValidateOnSet(object):
+
+    def tearDown(self):
+        ex.sess.rollback()
+        ex.sess.query(ex.ValidateOnSet).delete()
+        ex.sess.commit()
+        ex.sess.remove()
+
+    def flush_validated_fields(self):
+        """ flushes and returns the field names validated by the flush """
+        with mock.patch('savalidation._apply_plan', wraps=savalidation._apply_plan) as m_apply:
+            ex.sess.flush()
+        validated = set()
+        for call in m_apply.call_args_list:
+            entries, field_names = call[0][2], call[0][5]
+            validated.update(e.key for e in entries
+                             if field_names is None or e.key in field_names)
+        return validated
+
+    def test_validated_when_assigned(self):
+        vos = ex.ValidateOnSet(name=u'a' * 25)
+        eq_(vos._sav.assigned, {'name': [u'Enter a value less than 20 characters long']})
+        vos.name = u'joe'
+        eq_(vos._sav.assigned, {'name': []})
+
+    def test_converted_when_assigned(self):
+        vos = ex.ValidateOnSet(name=u'joe', created='2026-10-17 10:30')
+        eq_(vos.created, datetime(2026, 10, 17, 10, 30))
+
+    def test_flush_validates_fields_not_assigned(self):
+        vos = ex.ValidateOnSet(name=u'joe')
+        ex.sess.add(vos)
+        eq_(self.flush_validated_fields(), set(['nickname', 'created']))
+        eq_(vos._sav.assigned, None)
+
+        vos.nickname = u'joey!'
+        eq_(self.flush_validated_fields(), set(['name', 'created']))
+        ex.sess.commit()
+
+    def test_forgotten_on_rollback(self):
+        ex.sess.add(ex.ValidateOnSet(name=u'joe'))
+        ex.sess.commit()
+        vos = ex.sess.query(ex.ValidateOnSet).one()
+        vos.name = u'a' * 25
+        ex.sess.rollback()
+        eq_(vos.name, u'joe')
+        eq_(vos._sav.assigned, None)
+        vos.nickname = u'joey!'
+        ex.sess.commit()
+
+    def test_forgotten_on_refresh(self):
+        ex.sess.add(ex.ValidateOnSet(name=u'joe'))
+        ex.sess.commit()
+        vos = ex.sess.query(ex.ValidateOnSet).one()
+        vos.name = u'a' * 25
+        vos.nickname = u'joey!'
+        ex.sess.refresh(vos, ['name'])
+        # nickname depends on name, so it goes too
+        eq_(vos._sav.assigned, {})
+        vos.created = '2026-10-17 10:30'
+        ex.sess.commit()
+
+    def test_errors_reported_on_flush(self):
+        vos = ex.ValidateOnSet(name=u'joe', nickname=u'jo')
+        ex.sess.add(vos)
+        try:
+            ex.sess.flush()
+            assert False, 'expected exception'
+        except ValidationError:
+            ex.sess.rollback()
+        eq_(vos.validation_errors, {'nickname': [u'Enter a value at least 5 characters long']})
+
+    def test_fields_not_assigned_validated(self):
+        vos = ex.ValidateOnSet(nickname=u'joey!')
+        ex.sess.add(vos)
+        try:
+            ex.sess.flush()
+            assert False, 'expected exception'
+        except ValidationError:
+            ex.sess.rollback()
+        eq_(vos.validation_errors, {'name': [u'Please enter a value']})
+
+    def test_dependents_validated_again(self):
+        vos = ex.ValidateOnSet(name=u'joe', nickname=u'joey!')
+        eq_(sorted(vos._sav.assigned), ['name', 'nickname'])
+        vos.name = u'joseph'
+        eq_(sorted(vos._sav.assigned), ['name'])
+
+    def test_raise(self):
+        vos = ex.ValidateOnSet(name=u'joe')
+        with mock.patch.object(ex.ValidateOnSet, '_sav_validate_on_set', 'raise'):
+            try:
+                vos.name = u'a' * 25
+                assert False, 'expected exception'
+            except formencode.Invalid as e:
+                eq_(str(e), 'Enter a value less than 20 characters long')
+        eq_(vos.name, u'joe')
+
+
+class TestValidateMany(object):
+
+    def test_report(self):
+        instances = [
+            ex.Family(name=u'f1', reg_num=1),
+            ex.Person(name_first=u'randy', name_last=u'l1', family_role=u'foobar',
+                      nullable_but_required=u'f'),
+            ex.Family(name=u'f2'),
+            ex.NoMixin(name='nm'),
+            ex.DateTimeType(fld2='2010-09-26 10:47:35 pm'),
+        ]
+        report = ValidationMixin.validate_many(instances)
+        eq_(sorted(report.keys()), [1, 2])
+        eq_(list(report[1].keys()), ['family_role'])
+        eq_(report[2], {'reg_num': [u'Please enter a value']})
+        # the errors are the instance's errors
+        assert report[2] is instances[2].validation_errors
+        # before flush methods and conversions run like they would for a flush
+        eq_(instances[1].name_first, u'randall')
+        eq_(instances[4].fld2, datetime(2010, 9, 26, 22, 47, 35))
+        # no session was involved
+        assert not ex.sess.new
+
+    def test_before_exec(self):
+        instances = [ex.Order(), ex.Order(customer_id=1)]
+        eq_(ValidationMixin.validate_many(instances, 'before_flush'), {})
+        eq_(ValidationMixin.validate_many(instances, 'before_exec'),
+            {0: {'customer_id': [u'Please enter a value']}})
+
+    def test_errors_cleared(self):
+        instances = [ex.Order()]
+        for _ in range(2):
+            eq_(ValidationMixin.validate_many(instances, 'before_exec'),
+                {0: {'customer_id': [u'Please enter a value']}})
+
+    def test_valid_instances_get_no_helper(self):
+        instances = [ex.Family(name=u'f1', reg_num=1), ex.Family(name=u'f2')]
+        eq_(list(ValidationMixin.validate_many(instances).keys()), [1])
+        assert '_sav' not in instances[0].__dict__
+        # an existing helper's errors are cleared once the instance is valid
+        instances[1].reg_num = 2
+        eq_(ValidationMixin.validate_many(instances), {})
+        eq_(instances[1].validation_errors, {})
+
+    def test_events(self):
+        instances = [ex.Order(), ex.Family(name=u'f1', reg_num=1, status=u'foobar')]
+        report = ValidationMixin.validate_many(instances, ('before_flush', 'before_exec'))
+        eq_(sorted(report.keys()), [0, 1])
+        eq_(list(report[0].keys()), ['customer_id'])
+        eq_(list(report[1].keys()), ['status'])
+
+
+class TestExecutor(object):
+
+    def setUp(self):
+        try:
+            from concurrent.futures import ThreadPoolExecutor
+        except ImportError:
+            raise SkipTest('concurrent.futures is not available')
+        self.executor = ThreadPoolExecutor(4)
+        ex.sess.info['sav_executor'] = self.executor
+        ex.sess.info['sav_executor_chunk_size'] = 3
+
+    def tearDown(self):
+        self.executor.shutdown()
+        ex.sess.info.pop('sav_executor')
+        ex.sess.info.pop('sav_executor_chunk_size')
+        ex.sess.rollback()
+        ex.sess.query(ex.Family).delete()
+        ex.sess.query(ex.DateTimeType).delete()
+        ex.sess.commit()
+        ex.sess.remove()
+
+    def test_errors_merged(self):
+        families = [ex.Family(name=u'f{0}'.format(i), reg_num=i) for i in range(10)]
+        families[4].reg_num = None
+        families[8].status = u'foobar'
+        ex.sess.add_all(families)
+        try:
+            ex.sess.commit()
+            assert False, 'expected exception'
+        except ValidationError as e:
+            ex.sess.rollback()
+            eq_(set(e.invalid_instances), set([families[4], families[8]]))
+            eq_(families[4].validation_errors, {'reg_num': [u'Please enter a value']})
+            eq_(list(families[8].validation_errors.keys()), ['status'])
+
+    def test_assigned_cleared(self):
+        instances = [ex.ValidateOnSet(name=u'vos{0}'.format(i)) for i in range(5)]
+        ex.sess.add_all(instances)
+        ex.sess.commit()
+        eq_([vos._sav.assigned for vos in instances], [None] * 5)
+        ex.sess.query(ex.ValidateOnSet).delete()
+        ex.sess.commit()
+
+    def test_conversions_applied(self):
+        values = ['2010-09-{0:02d} 10:47:35 pm'.format(i) for i in range(1, 11)]
+        instances = [ex.DateTimeType(fld2=value) for value in values]
+        ex.sess.add_all(instances)
+        ex.sess.commit()
+        eq_([inst.fld2.day for inst in instances], list(range(1, 11)))
+
+    def test_before_flush_methods(self):
+        people = [ex.Person(name_first=u'randy', name_last=u'l{0}'.format(i),
+                            family_role=u'father', nullable_but_required=u'f')
+                  for i in range(5)]
+        people[2].name_last = u'Obama'
+        ex.sess.add_all(people)
+        try:
+            ex.sess.commit()
+            assert False, 'expected exception'
+        except ValidationError as e:
+            ex.sess.rollback()
+            eq_(e.invalid_instances, [people[2]])
+            eq_(people[0].name_first, u'randall')
+
+
+class TestMaxErrors(object):
+
+    def tearDown(self):
+        ex.sess.info.pop('sav_fail_fast', None)
+        ex.sess.info.pop('sav_max_errors', None)
+        ex.sess.rollback()
+        ex.sess.query(ex.Family).delete()
+        ex.sess.commit()
+        ex.sess.remove()
+
+    def flush_invalid(self, count=10):
+        families = [ex.Family(name=u'f{0}'.format(i), reg_num=i) for i in range(count)]
+        for family in families[::2]:
+            family.status = u'foo'
+        ex.sess.add_all(families)
+        try:
+            ex.sess.flush()
+            assert False, 'expected exception'
+        except ValidationError as e:
+            ex.sess.rollback()
+            return e
+
+    def test_unlimited(self):
+        e = self.flush_invalid()
+        eq_(len(e.invalid_instances), 5)
+        assert not e.truncated
+        assert 'validation stopped' not in str(e)
+
+    def test_session_fail_fast(self):
+        ex.sess.info['sav_fail_fast'] = True
+        e = self.flush_invalid()
+        eq_(len(e.invalid_instances), 1)
+        assert e.truncated
+        assert str(e).endswith('(validation stopped after 1 invalid instance(s))'), str(e)
+
+    def test_session_max_errors(self):
+        ex.sess.info['sav_max_errors'] = 3
+        e = self.flush_invalid()
+        eq_(len(e.invalid_instances), 3)
+        assert e.truncated
+
+    def test_class_max_errors(self):
+        with mock.patch.object(ex.Family, '_sav_max_errors', 2):
+            e = self.flush_invalid()
+        eq_(len(e.invalid_instances), 2)
+        assert e.truncated
+
+    def test_session_overrides_class(self):
+        ex.sess.info['sav_fail_fast'] = False
+        with mock.patch.object(ex.Family, '_sav_fail_fast', True):
+            e = self.flush_invalid()
+        eq_(len(e.invalid_instances), 5)
+
+    def test_before_exec(self):
+        ex.sess.info['sav_fail_fast'] = True
+        orders = [ex.Order() for _ in range(5)]
+        ex.sess.add_all(orders)
+        try:
+            ex.sess.flush()
+            assert False, 'expected exception'
+        except ValidationError as e:
+            ex.sess.rollback()
+            eq_(len(e.invalid_instances), 1)
+            assert e.truncated
+
+
+class TestErrorReporting(object):
+
+    def tearDown(self):
+        ex.sess.info.pop('sav_error_max_shown', None)
+        ex.sess.info.pop('sav_error_keep_instances', None)
+        ex.sess.rollback()
+        ex.sess.query(ex.Family).delete()
+        ex.sess.commit()
+        ex.sess.remove()
+
+    def flush_invalid(self, count):
+        families = [ex.Family(name=u'f{0}'.format(i), reg_num=i, status=u'foo')
+                    for i in range(count)]
+        ex.sess.add_all(families)
+        try:
+            ex.sess.flush()
+            assert False, 'expected exception'
+        except ValidationError as e:
+            ex.sess.rollback()
+            return e
+
+    def test_message_is_lazy(self):
+        with mock.patch.object(ex.Family, '__str__', return_value='<fam>') as m_str:
+            e = self.flush_invalid(3)
+            eq_(m_str.call_count, 0)
+            assert str(e).startswith('validation error(s): <fam> [status: "Value must be'), str(e)
+            str(e)
+            eq_(m_str.call_count, 3)
+
+    def test_args(self):
+        e = self.flush_invalid(1)
+        assert str(e).startswith('validation error(s): <Family'), str(e)
+        eq_(e.args, (str(e),))
+        eq_(repr(e), 'ValidationError(%r)' % str(e))
+
+    def test_message_capped(self):
+        ex.sess.info['sav_error_max_shown'] = 2
+        with mock.patch.object(ex.Family, '__str__', return_value='<fam>') as m_str:
+            e = self.flush_invalid(30)
+            assert str(e).endswith('; ... and 28 more'), str(e)[-50:]
+            eq_(m_str.call_count, 2)
+        eq_(len(e.invalid_instances), 30)
+        eq_(len(e.errors), 30)
+
+    def test_errors(self):
+        e = self.flush_invalid(2)
+        eq_(e.errors[0].model, 'Family')
+        eq_(e.errors[0].identity, (None,))
+        eq_(list(e.errors[0].errors), ['status'])
+
+    def test_primary_keys_only(self):
+        ex.sess.add(ex.Family(name=u'existing', reg_num=100))
+        ex.sess.commit()
+        family = ex.sess.query(ex.Family).one()
+        family.status = u'foo'
+        ex.sess.info['sav_error_keep_instances'] = False
+        try:
+            ex.sess.flush()
+            assert False, 'expected exception'
+        except ValidationError as e:
+            ex.sess.rollback()
+            eq_(e.invalid_instances, None)
+            expect = [InvalidInstance('Family', (family.id,), dict(family.validation_errors))]
+            eq_(e.errors, expect)
+            assert str(e).startswith(
+                'validation error(s): <Family identity=({0},)> [status: '.format(family.id)
+            ), str(e)
+
+
+class TestUnique(object):
+
+    def setUp(self):
+        ex.sess.add_all([
+            ex.Registration(code=u'c{0}'.format(i), email=u'{0}@example.com'.format(i))
+            for i in range(5)
+        ])
+        ex.sess.commit()
+        ex.sess.remove()
+
+    def tearDown(self):
+        ex.sess.rollback()
+        ex.sess.query(ex.Registration).delete()
+        ex.sess.commit()
+        ex.sess.remove()
+
+    def flush_invalid(self):
+        try:
+            ex.sess.flush()
+            assert False, 'expected exception'
+        except ValidationError as e:
+            ex.sess.rollback()
+            return e
+
+    def test_values_in_use(self):
+        regs = [ex.Registration(code=u'c{0}'.format(i), email=u'new{0}@example.com'.format(i))
+                for i in range(3, 8)]
+        regs[4].email = u'1@example.com'
+        ex.sess.add_all(regs)
+        e = self.flush_invalid()
+        eq_(e.invalid_instances, [regs[0], regs[1], regs[4]])
+        eq_(regs[0].validation_errors, {'code': ['Value is already in use']})
+        eq_(regs[4].validation_errors, {'email': ['Value is already in use']})
+
+    def test_duplicates_in_flush(self):
+        regs = [ex.Registration(code=u'n1'), ex.Registration(code=u'n2'),
+                ex.Registration(code=u'n1')]
+        ex.sess.add_all(regs)
+        e = self.flush_invalid()
+        eq_(e.invalid_instances, [regs[2]])
+        eq_(regs[2].validation_errors,
+            {'code': ['Value is used by another instance being saved']})
+
+    def test_queries_per_column(self):
+        regs = [ex.Registration(code=u'n{0}'.format(i)) for i in range(5)]
+        ex.sess.add_all(regs)
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            if statement.startswith('SELECT'):
+                statements.append(statement)
+        sa.event.listen(ex.engine, 'before_cursor_execute', count)
+        try:
+            ex.sess.flush()
+        finally:
+            sa.event.remove(ex.engine, 'before_cursor_execute', count)
+        # 5 codes in chunks of 2, the emails are all None
+        eq_(len(statements), 3)
+        ex.sess.commit()
+
+    def test_updates(self):
+        regs = ex.sess.query(ex.Registration).order_by(ex.Registration.id).all()
+        # unchanged values aren't checked
+        regs[0].email = u'changed@example.com'
+        ex.sess.flush()
+        regs[1].code = u'c2'
+        e = self.flush_invalid()
+        eq_(e.invalid_instances, [regs[1]])
+
+    def test_value_moved(self):
+        regs = ex.sess.query(ex.Registration).order_by(ex.Registration.id).all()
+        regs[0].email, regs[1].email = None, regs[0].email
+        ex.sess.flush()
+        ex.sess.commit()
+
+    def test_value_of_deleted(self):
+        # SA inserts before it deletes, so the value is still taken
+        regs = ex.sess.query(ex.Registration).order_by(ex.Registration.id).all()
+        ex.sess.delete(regs[2])
+        reg = ex.Registration(code=u'c2')
+        ex.sess.add(reg)
+        e = self.flush_invalid()
+        eq_(e.invalid_instances, [reg])
+
+
+class TestReferences(object):
+
+    def setUp(self):
+        ex.sess.add_all([ex.Customer(id=i, name=u'c{0}'.format(i)) for i in range(1, 6)])
+        ex.sess.commit()
+        ex.sess.remove()
+        val.clear_reference_caches(ex.Invoice)
+
+    def tearDown(self):
+        ex.sess.rollback()
+        ex.sess.query(ex.Invoice).delete()
+        ex.sess.query(ex.Customer).delete()
+        ex.sess.commit()
+        ex.sess.remove()
+
+    def count_selects(self):
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            if statement.startswith('SELECT'):
+                statements.append(statement)
+        sa.event.listen(ex.engine, 'before_cursor_execute', count)
+        try:
+            ex.sess.flush()
+        finally:
+            sa.event.remove(ex.engine, 'before_cursor_execute', count)
+        return len(statements)
+
+    def test_missing(self):
+        invoices = [ex.Invoice(customer_id=i) for i in range(3, 8)]
+        invoices.append(ex.Invoice(order_id=1))
+        ex.sess.add_all(invoices)
+        try:
+            ex.sess.flush()
+            assert False, 'expected exception'
+        except ValidationError as e:
+            ex.sess.rollback()
+            eq_(e.invalid_instances, invoices[3:])
+            eq_(invoices[3].validation_errors,
+                {'customer_id': ['The referenced record does not exist']})
+            eq_(invoices[5].validation_errors,
+                {'order_id': ['The referenced record does not exist']})
+
+    def test_batched_and_cached(self):
+        ex.sess.add_all([ex.Invoice(customer_id=i % 5 + 1) for i in range(20)])
+        # 5 distinct keys in chunks of 2
+        eq_(self.count_selects(), 3)
+        ex.sess.add_all([ex.Invoice(customer_id=i % 5 + 1) for i in range(20)])
+        eq_(self.count_selects(), 0)
+        info = val.reference_cache_info(ex.Invoice)
+        eq_(list(info.keys()), ['customer_id'])
+        eq_((info['customer_id'].hits, info['customer_id'].misses), (5, 5))
+        ex.sess.commit()
+
+    def test_pending_parents(self):
+        ex.sess.add(ex.Customer(id=10, name=u'c10'))
+        ex.sess.add(ex.Invoice(customer_id=10))
+        eq_(self.count_selects(), 0)
+        ex.sess.commit()
+
+    def test_deleted_parent(self):
+        customer = ex.sess.query(ex.Customer).get(2)
+        ex.sess.delete(customer)
+        invoice = ex.Invoice(customer_id=2)
+        ex.sess.add(invoice)
+        try:
+            ex.sess.flush()
+            assert False, 'expected exception'
+        except ValidationError as e:
+            ex.sess.rollback()
+            eq_(e.invalid_instances, [invoice])
+
+    def test_cached_after_commit(self):
+        ex.sess.add(ex.Invoice(customer_id=1))
+        eq_(self.count_selects(), 1)
+        # the session's later flushes can rely on the keys it found
+        ex.sess.add(ex.Invoice(customer_id=2))
+        ex.sess.add(ex.Invoice(customer_id=1))
+        eq_(self.count_selects(), 1)
+        eq_(val.reference_cache_info(ex.Invoice)['customer_id'].currsize, 0)
+        # the transaction could have been the one inserting them
+        ex.sess.rollback()
+        eq_(val.reference_cache_info(ex.Invoice)['customer_id'].currsize, 0)
+        ex.sess.add(ex.Invoice(customer_id=1))
+        eq_(self.count_selects(), 1)
+        ex.sess.commit()
+        eq_(val.reference_cache_info(ex.Invoice)['customer_id'].currsize, 1)
+
+    def test_cache_expires(self):
+        ex.sess.add(ex.Invoice(customer_id=1))
+        eq_(self.count_selects(), 1)
+        ex.sess.commit()
+        with mock.patch('savalidation.validators._monotonic', return_value=time.time() + 10 ** 9):
+            ex.sess.add(ex.Invoice(customer_id=1))
+            eq_(self.count_selects(), 1)
+        ex.sess.commit()
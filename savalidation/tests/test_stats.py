@@ -0,0 +1,87 @@
+from __future__ import absolute_import
+
+from nose.tools import eq_
+import sqlalchemy as sa
+
+from savalidation import ValidationError, ValidationMixin, _ValidationHelper
+import savalidation.stats as stats
+from savalidation.stats import StatsKey
+import savalidation.tests.examples as ex
+
+
+class TestStats(object):
+
+    def setUp(self):
+        stats.reset()
+        stats.enable()
+
+    def tearDown(self):
+        stats.disable()
+        stats.reset()
+        ex.sess.rollback()
+        ex.sess.query(ex.Person).delete()
+        ex.sess.commit()
+        ex.sess.remove()
+
+    def add_person(self, **kwargs):
+        values = dict(name_first=u'randy', name_last=u'smith', family_role=u'father',
+                      nullable_but_required=u'f')
+        values.update(kwargs)
+        ex.sess.add(ex.Person(**values))
+
+    def test_counts(self):
+        self.add_person()
+        self.add_person(family_role=u'foo')
+        try:
+            ex.sess.commit()
+            assert False, 'expected exception'
+        except ValidationError:
+            ex.sess.rollback()
+        timings = stats.snapshot()
+
+        role = timings[StatsKey('Person', 'family_role', '_OneOf', 'before_flush')]
+        eq_(role['calls'], 2)
+        eq_(role['errors'], 1)
+        assert role['total_time'] >= role['max_time'] > 0
+
+        validate = timings[StatsKey('Person', None, '_sav_validate', 'before_flush')]
+        eq_(validate['calls'], 2)
+        eq_(validate['errors'], 1)
+        eq_(timings[StatsKey('Person', None, 'run_event_schemas', 'before_flush')]['calls'], 2)
+        eq_(timings[StatsKey('Person', None, 'alter_name', 'before_flush')]['calls'], 2)
+
+    def test_before_flush_method_errors(self):
+        self.add_person(name_last=u'Obama')
+        try:
+            ex.sess.commit()
+            assert False, 'expected exception'
+        except ValidationError:
+            ex.sess.rollback()
+        timings = stats.snapshot()
+        eq_(timings[StatsKey('Person', None, 'enforce_president', 'before_flush')]['errors'], 1)
+        eq_(timings[StatsKey('Person', None, 'alter_name', 'before_flush')]['errors'], 0)
+
+    def test_event(self):
+        received = []
+
+        def listener(key, seconds, failed):
+            received.append((key, failed))
+        sa.event.listen(stats.collector, 'validation_timed', listener)
+        try:
+            self.add_person()
+            ex.sess.commit()
+        finally:
+            sa.event.remove(stats.collector, 'validation_timed', listener)
+        assert (StatsKey('Person', 'family_role', '_OneOf', 'before_flush'), False) in received
+        eq_(len(received), sum(t['calls'] for t in stats.snapshot().values()))
+
+    def test_disable_restores(self):
+        stats.disable()
+        eq_(ValidationMixin.__dict__['_sav_validate'].__func__.__name__, '_sav_validate')
+        eq_(_ValidationHelper.run_event_schemas.__name__, 'run_event_schemas')
+        for entry in ex.Person._sav_plan:
+            for to_python in entry.validators:
+                assert not hasattr(to_python, 'sav_wrapped')
+        self.add_person()
+        ex.sess.commit()
+        eq_(stats.snapshot(), {})
@@ -3,11 +3,17 @@ try:
     import six.moves.cPickle as pickle
 except ImportError:
     import pickle
+from decimal import Decimal
 import gc
+from timeit import default_timer
 
+import mock
+from nose.plugins.skip import SkipTest
 from nose.tools import eq_
+import sqlalchemy.exc as saexc
+import sqlalchemy.orm as saorm
 
-from savalidation import EntityRefMissing, ValidationError
+from savalidation import EntityRefMissing, ValidationError, _flush_contexts
 import savalidation.tests.examples as ex
 
 
@@ -71,6 +77,195 @@ class TestWeakReferences(object):
             pass
 
 
+class TestHelperMemory(object):
+
+    def test_per_instance_overhead(self):
+        try:
+            import tracemalloc
+        except ImportError:
+            raise SkipTest('tracemalloc is not available')
+        count = 2000
+        entities = [ex.SomeObj() for _ in range(count)]
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            for entity in entities:
+                entity._sav
+            gc.collect()
+            overhead = (tracemalloc.get_traced_memory()[0] - before) / float(count)
+        finally:
+            tracemalloc.stop()
+        print('validation helper overhead: {0:.0f} bytes per instance'.format(overhead))
+        # a slotted helper and its weak reference, no error storage until there is an error
+        assert overhead < 300, overhead
+        assert entities[0]._sav._errors is None
+
+    def test_pickling_errors(self):
+        so = ex.SomeObj()
+        so.add_validation_error('minlen', 'too short')
+        so2 = pickle.loads(pickle.dumps(so))
+        eq_(so2.validation_errors, {'minlen': ['too short']})
+
+
+class TestCompactPickle(object):
+
+    def setUp(self):
+        ex.sess.add(ex.SomeObj(minlen=u'a' * 20, ipaddr='127.0.0.1', prec1=Decimal('1.5')))
+        ex.sess.commit()
+        ex.sess.remove()
+
+    def tearDown(self):
+        ex.sess.rollback()
+        ex.sess.query(ex.SomeObj).delete()
+        ex.sess.commit()
+        ex.sess.remove()
+
+    def load(self):
+        so = ex.sess.query(ex.SomeObj).one()
+        # a validated instance has its helper
+        so._sav
+        return so
+
+    def measure(self, so, count=200):
+        pstr = pickle.dumps(so, pickle.HIGHEST_PROTOCOL)
+        start = default_timer()
+        for _ in range(count):
+            pickle.loads(pickle.dumps(so, pickle.HIGHEST_PROTOCOL))
+        return len(pstr), (default_timer() - start) / count
+
+    def test_helper_omitted(self):
+        so = self.load()
+        so2 = pickle.loads(pickle.dumps(so))
+        assert '_sav' not in so2.__dict__
+        # created again when needed
+        eq_(so2.validation_errors, {})
+        assert so2._sav.entity is so2
+        merged = ex.sess.merge(so2)
+        eq_(merged.validation_errors, {})
+
+    def test_helper_with_errors_kept(self):
+        so = self.load()
+        so.add_validation_error('minlen', 'too short')
+        so2 = pickle.loads(pickle.dumps(so))
+        eq_(so2.validation_errors, {'minlen': ['too short']})
+
+    def test_size_and_time(self):
+        plain = ex.sess.query(ex.SomeObj).one()
+        assert '_sav' not in plain.__dict__
+        plain_size, plain_time = self.measure(plain)
+        ex.sess.remove()
+
+        so = self.load()
+        compact_size, compact_time = self.measure(so)
+        with mock.patch.object(ex.SomeObj, '_sav_compact_pickle', False):
+            full_size, full_time = self.measure(so)
+        print('pickled size: plain {0}, compact {1}, with helper {2} bytes'.format(
+            plain_size, compact_size, full_size))
+        print('pickle and unpickle: plain {0:.1f}, compact {1:.1f}, with helper {2:.1f} us'.format(
+            plain_time * 1e6, compact_time * 1e6, full_time * 1e6))
+        eq_(compact_size, plain_size)
+        assert full_size > compact_size
+
+
+class TestStateInfoBackend(object):
+
+    def setUp(self):
+        self.patcher = mock.patch.object(ex.SomeObj, '_sav_state_backend', 'instance_state')
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        ex.sess.rollback()
+        ex.sess.query(ex.SomeObj).delete()
+        ex.sess.commit()
+        ex.sess.remove()
+
+    def test_errors_in_state_info(self):
+        so = ex.SomeObj(minlen=u'short')
+        ex.sess.add(so)
+        try:
+            ex.sess.flush()
+            assert False, 'expected exception'
+        except ValidationError as e:
+            ex.sess.rollback()
+            eq_(e.invalid_instances, [so])
+        expect = {'minlen': [u'Enter a value at least 20 characters long']}
+        eq_(so.validation_errors, expect)
+        eq_(saorm.attributes.instance_state(so).info['sav_errors'], expect)
+        assert '_sav' not in so.__dict__
+
+        so.minlen = u'a' * 20
+        ex.sess.add(so)
+        ex.sess.commit()
+        eq_(so.validation_errors, {})
+        assert not saorm.attributes.instance_state(so).info.get('sav_errors')
+
+    def test_no_weak_reference(self):
+        helper = ex.SomeObj()._sav
+        gc.collect()
+        # the helper keeps its entity, so there is no EntityRefMissing
+        eq_(helper.entity.__class__, ex.SomeObj)
+
+    def test_pickling_errors(self):
+        so = ex.SomeObj()
+        so.add_validation_error('minlen', 'too short')
+        so2 = pickle.loads(pickle.dumps(so))
+        eq_(so2.validation_errors, {'minlen': ['too short']})
+
+    def test_fingerprint_not_pickled(self):
+        with mock.patch.object(ex.SkipUnchanged, '_sav_state_backend', 'instance_state'):
+            su = ex.SkipUnchanged(name=u'joe')
+            ex.sess.add(su)
+            ex.sess.flush()
+            assert su._sav.fingerprint is not None
+            # only errors are kept in info, SA pickles it with the entity
+            assert not saorm.attributes.instance_state(su).info
+            su2 = pickle.loads(pickle.dumps(su))
+            eq_(su2._sav.fingerprint, None)
+
+    def test_assigned_not_pickled(self):
+        with mock.patch.object(ex.ValidateOnSet, '_sav_state_backend', 'instance_state'):
+            vos = ex.ValidateOnSet(name=u'joe')
+            eq_(vos._sav.assigned, {'name': []})
+            assert not saorm.attributes.instance_state(vos).info
+            vos2 = pickle.loads(pickle.dumps(vos))
+            eq_(vos2._sav.assigned, None)
+
+
+class TestLazyHelper(object):
+
+    def tearDown(self):
+        ex.sess.rollback()
+        ex.sess.query(ex.SomeObj).delete()
+        ex.sess.commit()
+        ex.sess.remove()
+
+    def test_not_created_on_load(self):
+        ex.sess.add(ex.SomeObj(minlen='a' * 20))
+        ex.sess.commit()
+        ex.sess.remove()
+
+        so = ex.sess.query(ex.SomeObj).first()
+        assert '_sav' not in so.__dict__
+        eq_(so.validation_errors, {})
+        assert so.__dict__['_sav'] is so._sav
+
+    def test_created_on_validation(self):
+        ex.sess.add(ex.SomeObj(minlen='a' * 20))
+        ex.sess.commit()
+        ex.sess.remove()
+
+        so = ex.sess.query(ex.SomeObj).first()
+        so.minlen = 'a'
+        try:
+            ex.sess.commit()
+            assert False, 'expected exception'
+        except ValidationError:
+            ex.sess.rollback()
+            eq_(so.validation_errors, {'minlen': [u'Enter a value at least 20 characters long']})
+
+
 class TestBeforeFlushHelper(object):
     def setUp(self):
         ex.sess.query(ex.Person).delete()
@@ -132,12 +327,134 @@ class TestBeforeFlushHelper(object):
             eq_(c.validation_errors, expect)
 
 
-class TestFESchemas(object):
+class TestFlushContext(object):
+    def tearDown(self):
+        ex.sess.rollback()
+        ex.sess.query(ex.Order).delete()
+        ex.sess.query(ex.Family).delete()
+        ex.sess.commit()
+        ex.sess.remove()
+
+    def test_session_not_looked_up_per_row(self):
+        ex.sess.add_all([ex.Family(name=u'f{0}'.format(i), reg_num=i) for i in range(20)])
+        object_session = saorm.session.Session.object_session
+        with mock.patch.object(saorm.session.Session, 'object_session',
+                               side_effect=object_session) as m_object_session:
+            ex.sess.commit()
+        eq_(m_object_session.call_count, 0)
+        eq_(len(_flush_contexts), 0)
+
+    def test_sessions_sharing_a_connection(self):
+        ex.sess.add(ex.Family(name=u'f1', reg_num=1))
+        ex.sess.commit()
+        conn = ex.engine.connect()
+        trans = conn.begin()
+        try:
+            s1 = saorm.Session(bind=conn)
+            s2 = saorm.Session(bind=conn)
+            # a dirty instance without net changes still gets a before_update event
+            fam = s1.query(ex.Family).one()
+            fam.name = fam.name
+            s1.flush()
+            s2.add(ex.Family(name=u'f2', reg_num=2, status=u'foo'))
+            try:
+                s2.flush()
+                assert False, 'expected exception'
+            except ValidationError as e:
+                eq_(len(e.invalid_instances), 1)
+            eq_(len(_flush_contexts), 0)
+        finally:
+            trans.rollback()
+            conn.close()
+
+    def test_only_invalid_reported(self):
+        families = [ex.Family(name=u'f{0}'.format(i), reg_num=i) for i in range(20)]
+        families[5].status = u'foo'
+        order = ex.Order()
+        ex.sess.add_all(families + [order])
+        try:
+            ex.sess.commit()
+            assert False, 'expected exception'
+        except ValidationError as e:
+            ex.sess.rollback()
+            # before_flush errors first, then before_exec errors
+            eq_(e.invalid_instances, [families[5], order])
+        eq_(len(_flush_contexts), 0)
+
+    def test_released_after_failed_flush(self):
+        ex.sess.add(ex.Family(name=u'f1', reg_num=1))
+        ex.sess.commit()
+        ex.sess.add(ex.Family(name=u'f1', reg_num=2))
+        ex.sess.add(ex.Family(name=u'f2', reg_num=3))
+        try:
+            ex.sess.commit()
+            assert False, 'expected exception'
+        except saexc.IntegrityError:
+            ex.sess.rollback()
+        eq_(len(_flush_contexts), 0)
+        ex.sess.add(ex.Family(name=u'f3', reg_num=3))
+        ex.sess.commit()
+
+
+class TestFEPlans(object):
 
     def test_convert_flag(self):
         ex.ConversionTester()
-        schemas = ex.ConversionTester._sav_fe_schemas
+        plans = ex.ConversionTester._sav_event_plans
         # validation
-        eq_(set(schemas['before_flush'][0].fields.keys()), set(['val1', 'val4']))
+        eq_(set(e.key for e in plans['before_flush'][0]), set(['val1', 'val4']))
         # conversion
-        eq_(set(schemas['before_flush'][1].fields.keys()), set(['val2', 'val3']))
+        eq_(set(e.key for e in plans['before_flush'][1]), set(['val2', 'val3']))
+
+    def test_plan_entries(self):
+        ex.Family()
+        plan = ex.Family._sav_plan
+        # entries are in column order and the primary key is not validated
+        eq_([e.key for e in plan], ['name', 'reg_num', 'status'])
+        status = plan[-1]
+        eq_(status.event, 'before_flush')
+        eq_(status.is_converter, False)
+        # MaxLength and OneOf
+        eq_(len(status.validators), 2)
+
+    def test_multiple_values_rejected(self):
+        f1 = ex.Family(name=[u'f1', u'f2'], reg_num=1)
+        assert f1._sav.run_event_schemas('before_flush')
+        eq_(f1.validation_errors, {'name': [u'Please provide only one value']})
+
+
+class TestClassMetadata(object):
+
+    def test_cached(self):
+        ex.Family()
+        metadata = ex.Family._sav_class_metadata()
+        assert metadata is ex.Family._sav_class_metadata()
+        eq_(metadata.column_names, ('id', 'createdts', 'updatedts', 'name', 'reg_num', 'status'))
+
+    def test_column_info(self):
+        columns = ex.Order._sav_class_metadata().columns
+        assert columns['id'].primary_key
+        assert columns['customer_id'].foreign_keys
+        assert not columns['customer_id'].nullable
+        assert columns['createdts'].has_default
+        assert columns['note'].nullable
+        assert ex.Order._sav_class_metadata().needs_not_empty('customer_id')
+        assert not ex.Order._sav_class_metadata().needs_not_empty('createdts')
+
+    def test_event_fields(self):
+        event_fields = ex.Order._sav_class_metadata().event_fields
+        # the integer check happens before flush, the not null check once SA has set the FK
+        eq_(event_fields['before_flush'], frozenset(['customer_id']))
+        eq_(event_fields['before_exec'], frozenset(['customer_id']))
+
+    def test_rebuilt_for_new_mapper(self):
+        metadata = ex.Family._sav_class_metadata()
+        try:
+            metadata.mapper = None
+            new_metadata = ex.Family._sav_class_metadata()
+            assert new_metadata is not metadata
+            eq_(new_metadata.column_names, metadata.column_names)
+            eq_(new_metadata.event_fields, metadata.event_fields)
+        finally:
+            ex.Family._sav_metadata = metadata
+            metadata.mapper = ex.Family.__mapper__
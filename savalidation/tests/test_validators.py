@@ -1,4 +1,9 @@
 from __future__ import absolute_import
+import datetime as dt
+from decimal import Decimal
+
+from dateutil.parser import parse
+import formencode
 import mock
 from nose.tools import eq_
 from . import examples as ex
@@ -158,6 +163,148 @@ class TestValidators(object):
             eq_(e.invalid_instances[0].validation_errors,
                 {'prec2': ['Please enter a number with 0 or fewer decimal places']})
 
+    def test_numeric_fast_paths(self):
+        validator = sav.NumericValidator(12, 2)
+        value = Decimal('1234.56')
+        assert validator.to_python(value) is value
+        eq_(validator.to_python(1234), Decimal('1234'))
+        eq_(validator.to_python('1234.5'), Decimal('1234.5'))
+        # no bounds without a precision and scale
+        eq_(sav.NumericValidator(None, None).to_python('1234.567'), Decimal('1234.567'))
+
+
+class TestOneOf(object):
+
+    def tearDown(self):
+        ex.sess.rollback()
+        ex.sess.query(ex.Product).delete()
+        ex.sess.query(ex.Family).delete()
+        ex.sess.commit()
+
+    def test_membership(self):
+        validator = sav._OneOf(list(range(50000)))
+        eq_(validator._loaded[1], frozenset(range(50000)))
+        eq_(validator.to_python(49999), 49999)
+        try:
+            validator.to_python(50000)
+            assert False, 'expected exception'
+        except formencode.Invalid as e:
+            assert str(e).endswith('49998; 49999 (not 50000)'), str(e)[-50:]
+
+    def test_unhashable(self):
+        validator = sav._OneOf([[1], [2]])
+        eq_(validator._loaded[1], None)
+        eq_(validator.to_python([2]), [2])
+        validator = sav._OneOf([1, 2])
+        try:
+            validator.to_python([1])
+            assert False, 'expected exception'
+        except formencode.Invalid as e:
+            eq_(str(e), 'Value must be one of: 1; 2 (not [1])')
+
+    def test_callable_and_refresh(self):
+        ex.sess.add(ex.Product(code=u'a1', category=u'toys'))
+        ex.sess.commit()
+        with mock.patch.object(ex, 'PRODUCT_CODES', [u'a1', u'c3']), \
+                mock.patch.object(ex, 'PRODUCT_CATEGORIES', [(u'games', 'Games')]):
+            product = ex.Product(code=u'c3', category=u'games')
+            ex.sess.add(product)
+            try:
+                ex.sess.commit()
+                assert False, 'expected exception'
+            except ValidationError:
+                ex.sess.rollback()
+            sav.refresh_choices(ex.Product)
+            ex.sess.add(product)
+            ex.sess.commit()
+        # the patched values are still loaded until the next refresh
+        ex.sess.add(ex.Product(code=u'c3'))
+        ex.sess.commit()
+        sav.refresh_choices(ex.Product, 'code')
+        ex.sess.add(ex.Product(code=u'c3'))
+        try:
+            ex.sess.commit()
+            assert False, 'expected exception'
+        except ValidationError as e:
+            ex.sess.rollback()
+            eq_(list(e.invalid_instances[0].validation_errors), ['code'])
+
+    def test_query(self):
+        ex.sess.add(ex.Family(name=u'f1', reg_num=1))
+        ex.sess.commit()
+        validator = sav._OneOf(ex.sess.query(ex.Family.name))
+        eq_(validator.to_python(u'f1'), u'f1')
+        ex.sess.add(ex.Family(name=u'f2', reg_num=2))
+        ex.sess.commit()
+        try:
+            validator.to_python(u'f2')
+            assert False, 'expected exception'
+        except formencode.Invalid:
+            pass
+        validator.refresh()
+        eq_(validator.to_python(u'f2'), u'f2')
+
+
+class TestConverters(object):
+
+    def tearDown(self):
+        ex.sess.rollback()
+        ex.sess.query(ex.CachedDateTimeType).delete()
+        ex.sess.commit()
+
+    def test_iso_fast_path(self):
+        conv = sav.DateTimeConverter()
+        for value in ('2010-09-26', '2010-09-26 22:47', '2010-09-26T22:47:35',
+                      '2010-09-26 22:47:35.5', '2010-09-26T22:47:35.123456'):
+            assert sav._parse_iso_datetime(value) is not None, value
+            eq_(conv.to_python(value), parse(value))
+
+    def test_iso_fallback(self):
+        conv = sav.DateTimeConverter()
+        # time zones, other formats and bad dates are left to dateutil
+        for value in ('2010-09-26T22:47:35Z', '2010-09-26 22:47:35+05:00', '09/26/2010',
+                      '2010-09-26 10:47:35 pm', '20100926'):
+            eq_(sav._parse_iso_datetime(value), None)
+            eq_(conv.to_python(value), parse(value))
+        eq_(sav._parse_iso_datetime('2010-02-30'), None)
+
+    def test_cache(self):
+        conv = sav.DateTimeConverter(cache_size=2)
+        eq_(conv.to_python('2010-09-26'), dt.datetime(2010, 9, 26))
+        eq_(conv.to_python('2010-09-26'), dt.datetime(2010, 9, 26))
+        conv.to_python('2010-09-27')
+        # the least recently used value is dropped
+        conv.to_python('2010-09-28')
+        conv.to_python('2010-09-26')
+        info = conv.cache_info()
+        eq_(info, (1, 4, 2, 2))
+        eq_(info.hit_ratio, 0.2)
+        conv.cache_clear()
+        eq_(conv.cache_info(), (0, 0, 2, 0))
+
+    def test_cache_off_by_default(self):
+        conv = sav.DateTimeConverter()
+        conv.to_python('2010-09-26')
+        conv.to_python('2010-09-26')
+        eq_(conv.cache_info(), (0, 0, 0, 0))
+
+    def test_conversion_cache_info(self):
+        for value in ('9/23/2010', '9/23/2010', 'foo'):
+            inst = ex.CachedDateTimeType(fld=value, fld2='2010-09-26 10:47:35 pm',
+                                         fld3='10:25:33 am')
+            ex.sess.add(inst)
+            try:
+                ex.sess.flush()
+            except ValidationError:
+                ex.sess.rollback()
+        eq_(inst.validation_errors, {'fld': [u'Please enter the date in the form MM/DD/YYYY']})
+        info = sav.conversion_cache_info(ex.CachedDateTimeType)
+        eq_(sorted(info.keys()), ['fld', 'fld2'])
+        # invalid values aren't cached
+        eq_(info['fld'].currsize, 1)
+        eq_(info['fld'].hits, 1)
+        eq_(info['fld2'].hits, 2)
+
 
 class TestValidatorBase(object):
 
@@ -175,3 +322,12 @@ class TestValidatorBase(object):
         m_fe_validator.assert_called_once_with()
         eq_(len(vb.fev_metas), 1)
         eq_(vb.fev_metas[0].is_converter, True)
+
+    def test_constraint_validators_shared(self):
+        def validators(entitycls, field_name):
+            return [v for name, v in sav._plan_validators(entitycls) if name == field_name]
+        # both are Unicode(75) and NOT NULL without a default
+        family_name = validators(ex.Family, 'name')
+        eq_(len(family_name), 2)
+        eq_([id(v) for v in family_name], [id(v) for v in validators(ex.Person, 'name_first')])
+        assert family_name[0] is not validators(ex.Person, 'family_role')[0]
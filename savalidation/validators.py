@@ -1,13 +1,18 @@
 from __future__ import absolute_import
 
+from collections import defaultdict, namedtuple, OrderedDict
+import datetime as dt
 from decimal import Decimal, DecimalException
+import re
 import sys
+import threading
+import time
+import weakref
 
-from dateutil.parser import parse
 import formencode
 import formencode.validators as fev
-import formencode.national
 import sqlalchemy as sa
+import sqlalchemy.orm as saorm
 
 from savalidation._internal import is_iterable
 import six
@@ -33,35 +38,38 @@ class NumericValidator(BaseValidator):
         self.places = places
         self.prec = prec
         super(NumericValidator, self).__init__()
+        # everything validate_python() needs that only depends on the column type
+        self._bounded = places is not None and prec is not None
+        if self._bounded:
+            self._max_before_point = places - prec
+            max_val = '{}.{}'.format('9' * self._max_before_point, '9' * prec)
+            self._too_big_msg = 'Please enter a number that is {} or smaller'.format(max_val)
+            self._too_small_msg = 'Please enter a number that is -{} or greater'.format(max_val)
+            self._quant = Decimal('1') / (Decimal('10') ** prec) if prec else Decimal('0')
+            self._places_msg = 'Please enter a number with {} or fewer decimal places'.format(
+                prec
+            )
 
     def _to_python(self, value, state):
+        # values from the database or the application are usually Decimals already
+        if type(value) is Decimal:
+            return value
         try:
             return Decimal(value)
         except DecimalException:
             raise formencode.Invalid('Please enter a number', value, state)
 
     def validate_python(self, value, state):
-        super(BaseValidator, self)._validate_python(value, state)
-        if value is None or self.places is None or self.prec is None:
+        if value is None or not self._bounded:
             return
-        max_before_point = self.places - self.prec
-        if value.adjusted() + 1 > max_before_point:
-            max_val = '{}.{}'.format('9' * max_before_point, '9' * self.prec)
+        if value.adjusted() + 1 > self._max_before_point:
             if value >= 0:
-                raise formencode.Invalid(
-                    'Please enter a number that is {} or smaller'.format(max_val), state, value
-                )
+                raise formencode.Invalid(self._too_big_msg, state, value)
             else:
-                raise formencode.Invalid(
-                    'Please enter a number that is -{} or greater'.format(max_val), state, value
-                )
+                raise formencode.Invalid(self._too_small_msg, state, value)
 
-        quant = Decimal('1') / (Decimal('10') ** self.prec) if self.prec else Decimal('0')
-        if value.quantize(quant) != value:
-            raise formencode.Invalid(
-                'Please enter a number with {} or fewer decimal places'.format(self.prec),
-                state, value
-            )
+        if value.quantize(self._quant) != value:
+            raise formencode.Invalid(self._places_msg, state, value)
 
 
 # map a SA field type to a formencode validator for use in _ValidatesConstraints
@@ -69,6 +77,22 @@ SA_FORMENCODE_MAPPING = {
     sa.types.Integer: formencode.validators.Int,
 }
 
+# validators shared by all the columns and classes configuring them the same way
+_interned_validators = {}
+
+
+def interned_validator(fev_cls, *args, **kwargs):
+    """
+        Returns the shared instance of fev_cls(*args, **kwargs), created on first use.  Only
+        for validators that don't keep state between calls, so not for the converters with a
+        cache_size or one_of validators that load their values.
+    """
+    key = (fev_cls, args, tuple(sorted(kwargs.items())))
+    validator = _interned_validators.get(key)
+    if validator is None:
+        validator = _interned_validators.setdefault(key, fev_cls(*args, **kwargs))
+    return validator
+
 
 class EntityLinker(object):
     """
@@ -100,7 +124,10 @@ class FEVMeta(object):
     """
     ALL_EVENTS = 'before_flush', 'before_exec'
 
-    def __init__(self, fev, field_name=None, event='before_flush', is_converter=False):
+    __slots__ = ('fev', 'field_name', 'event', 'is_converter', 'depends_on')
+
+    def __init__(self, fev, field_name=None, event='before_flush', is_converter=False,
+                 depends_on=()):
         if event not in self.ALL_EVENTS:
             raise ValueError('got "{0}" for event, should be one of: {1}'.format(event,
                                                                                  self.ALL_EVENTS))
@@ -108,6 +135,9 @@ class FEVMeta(object):
         self.field_name = field_name
         self.event = event
         self.is_converter = is_converter
+        # other columns which, when changed, require this field to be validated again
+        # even though it was not changed itself (see ValidationMixin._sav_validate_dirty_only)
+        self.depends_on = tuple(depends_on)
 
     def __repr__(self):
         return '<FEVMeta: field_name={0}; event={1}; is_conv={2}; fev={3}'.format(
@@ -126,6 +156,8 @@ class ValidatorBase(object):
         self.field_names = []
         self.fe_args = []
         self.fev_metas = []
+        # BatchValidator instances, for validation that needs all the flushed instances
+        self.batch_validators = []
 
         self.split_field_names_from_fe_args()
         self.create_fe_validators()
@@ -149,35 +181,150 @@ class ValidatorBase(object):
         kwargs.update(self.kwargs)
         convert_flag = kwargs.pop('sav_convert', kwargs.pop('sv_convert', False))
         sav_event = kwargs.pop('sav_event', 'before_flush')
+        depends_on = kwargs.pop('sav_depends_on', ())
+        if not is_iterable(depends_on):
+            depends_on = (depends_on,)
 
         for field_to_validate in self.field_names:
             self.create_fev_meta(self.fe_validator, field_to_validate, kwargs, sav_event,
-                                 convert_flag)
+                                 convert_flag, depends_on=depends_on)
 
     def create_fev_meta(self, fev_cls, colname, fe_kwargs={}, sav_event='before_flush',
-                        convert_flag=False, auto_not_empty=True):
+                        convert_flag=False, auto_not_empty=True, depends_on=()):
         fe_kwargs = fe_kwargs.copy()
         if auto_not_empty and self.sa_column_needs_not_empty(colname):
             fe_kwargs['not_empty'] = True
         fev = fev_cls(*self.fe_args, **fe_kwargs)
-        fev_meta = FEVMeta(fev, colname, sav_event, convert_flag)
+        fev_meta = FEVMeta(fev, colname, sav_event, convert_flag, depends_on)
         self.fev_metas.append(fev_meta)
 
     def sa_column_needs_not_empty(self, colname):
+        metadata = self.entitycls._sav_class_metadata()
+        if colname in metadata.columns:
+            return metadata.needs_not_empty(colname)
         col = self.fetch_sa_column(colname)
         if not col.nullable and not col.default and not col.server_default:
             return True
         return False
 
     def fetch_sa_column(self, colname):
+        info = self.entitycls._sav_class_metadata().columns.get(colname)
+        if info is not None:
+            return info.column
         return self.entitycls.__mapper__.get_property(colname).columns[0]
 
     def arg_for_fe_validator(self, index, unknown_arg):
         return False
 
 
-class DateTimeConverter(BaseValidator):
+class CacheInfo(namedtuple('CacheInfo', 'hits misses maxsize currsize')):
+    @property
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+
+class _ConversionCache(object):
+    """ a bounded LRU mapping of string values to what they converted to """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            # re-inserting makes it the most recently used
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
+
+
+_MISSING = object()
+
+
+class CachedConversion(object):
+    """
+        Mixin for the converters which keeps the results of converting strings in a bounded LRU
+        cache.  It's off unless the validator is given a cache_size, e.g.:
+
+            converts_datetime('createdts', cache_size=1000)
+
+        Only successful conversions are cached.  cache_info() reports how well it's working.
+    """
+    cache_size = 0
+
+    def to_python(self, value, state=None):
+        if not self.cache_size or not isinstance(value, six.string_types):
+            return super(CachedConversion, self).to_python(value, state)
+        cache = self.__dict__.get('_conversion_cache')
+        if cache is None:
+            cache = self._conversion_cache = _ConversionCache(self.cache_size)
+        result = cache.get(value, _MISSING)
+        if result is _MISSING:
+            result = super(CachedConversion, self).to_python(value, state)
+            cache.put(value, result)
+        return result
+
+    def cache_info(self):
+        cache = self.__dict__.get('_conversion_cache')
+        if cache is None:
+            return CacheInfo(0, 0, self.cache_size, 0)
+        return cache.info()
+
+    def cache_clear(self):
+        self.__dict__.pop('_conversion_cache', None)
+
+
+# the ISO 8601 forms dateutil would parse to a naive datetime
+_ISO_DATETIME = re.compile(
+    r'(\d{4})-(\d{2})-(\d{2})(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:\.(\d{1,6}))?)?)?$'
+)
+
+
+def _parse_iso_datetime(value):
+    """ returns the datetime for a strict ISO 8601 string without a time zone, or None """
+    match = _ISO_DATETIME.match(value)
+    if match is None:
+        return None
+    year, month, day, hour, minute, second, fraction = match.groups()
+    try:
+        return dt.datetime(
+            int(year), int(month), int(day),
+            int(hour or 0), int(minute or 0), int(second or 0),
+            int(fraction.ljust(6, '0')) if fraction else 0,
+        )
+    except ValueError:
+        # e.g. Feb 30th, dateutil gets to decide what the error is
+        return None
+
+
+class DateTimeConverter(CachedConversion, BaseValidator):
     def _to_python(self, value, state):
+        # most values are ISO 8601 strings which don't need dateutil's guesswork
+        if isinstance(value, six.string_types):
+            parsed = _parse_iso_datetime(value)
+            if parsed is not None:
+                return parsed
+        # dateutil is imported here rather than with the module, it's slow to import and only
+        # needed for strings that aren't ISO 8601
+        from dateutil.parser import parse
         try:
             return parse(value)
         except ValueError as e:
@@ -192,17 +339,106 @@ class DateTimeConverter(BaseValidator):
             raise formencode.Invalid('Unknown date/time string "%s"' % value, value, state)
 
 
+class DateConverter(CachedConversion, fev.DateConverter):
+    pass
+
+
+class TimeConverter(CachedConversion, fev.TimeConverter):
+    pass
+
+
+def _plan_validators(entitycls):
+    """ yields (field name, formencode validator) for each validator in a class's plan """
+    for entry in entitycls._sav_plan:
+        for to_python in entry.validators:
+            # savalidation.stats keeps the original on the function it wraps validators in
+            to_python = getattr(to_python, 'sav_wrapped', to_python)
+            validator = getattr(to_python, '__self__', None)
+            if validator is not None:
+                yield entry.key, validator
+
+
+def conversion_cache_info(entitycls):
+    """
+        Returns a dict mapping the field names of a class's cached converters to their
+        CacheInfo, to help tune cache_size.
+    """
+    info = {}
+    for key, validator in _plan_validators(entitycls):
+        if isinstance(validator, CachedConversion) and validator.cache_size:
+            info[key] = validator.cache_info()
+    return info
+
+
 @entity_linker
 class _ValidatesPresenceOf(ValidatorBase):
     fe_validator = formencode.FancyValidator
     default_kwargs = dict(not_empty=True)
 
 
+class _OneOf(fev.OneOf):
+    """
+        OneOf checking membership with a frozenset instead of scanning the list.
+
+        The list can also be a callable returning the values or an iterable like a query
+        selecting one column.  Those are loaded the first time a value is validated, so the
+        database doesn't need to be available when the class is configured, and loaded again
+        after refresh().
+    """
+    _loaded = None
+
+    def __init__(self, *args, **kwargs):
+        super(_OneOf, self).__init__(*args, **kwargs)
+        if isinstance(self.list, (list, tuple, set, frozenset)):
+            self._load()
+
+    def _load(self):
+        source = self.list
+        if callable(source):
+            source = source()
+        # rows of a query selecting a single column
+        values = [v[0] if hasattr(v, '_fields') and len(v) == 1 else v for v in source]
+        try:
+            choices = frozenset(values)
+        except TypeError:
+            # unhashable choices, fall back to scanning the list
+            choices = None
+        # the values are kept in order for the error message
+        self._loaded = loaded = (values, choices)
+        return loaded
+
+    def refresh(self):
+        """ forget the loaded values so they are loaded again on the next validation """
+        if callable(self.list) or not isinstance(self.list, (list, tuple, set, frozenset)):
+            self._loaded = None
+        else:
+            self._load()
+
+    def _validate_python(self, value, state):
+        if self.testValueList and isinstance(value, (list, tuple)):
+            for v in value:
+                self._validate_python(v, state)
+            return
+        values, choices = self._loaded or self._load()
+        try:
+            if value in (values if choices is None else choices):
+                return
+        except TypeError:
+            # an unhashable value can still be equal to one of the values
+            if value in values:
+                return
+        if self.hideList:
+            raise formencode.Invalid(self.message('invalid', state), value, state)
+        items = '; '.join(map(str, values))
+        raise formencode.Invalid(self.message('notIn', state, items=items, value=value),
+                                 value, state)
+
+
 class _ValidatesOneOf(ValidatorBase):
-    fe_validator = fev.OneOf
+    fe_validator = _OneOf
 
     def arg_for_fe_validator(self, index, unknown_arg):
-        return is_iterable(unknown_arg)
+        return is_iterable(unknown_arg) or callable(unknown_arg)
 
 
 class _MinLength(fev.MinLength):
@@ -248,10 +484,312 @@ class _ValidatesChoices(_ValidatesOneOf):
         # the first formencode parameter should be a sequence of pairs.  However,
         # the FE validator needs just the list of keys that are valid, so we
         # strip those off here.
-        self.fe_args[0] = [k for k, v in self.fe_args[0]]
+        choices = self.fe_args[0]
+        if isinstance(choices, (list, tuple)):
+            self.fe_args[0] = [k for k, v in choices]
+        elif callable(choices):
+            self.fe_args[0] = lambda: [k for k, v in choices()]
+        else:
+            # an iterable to load lazily, e.g. a query
+            self.fe_args[0] = lambda: [k for k, v in choices]
         ValidatorBase.create_fe_validators(self)
 
 
+def refresh_choices(entitycls, field_name=None):
+    """
+        Reloads the values of a class's validates_one_of() and validates_choices() validators
+        which were given a callable or query, for all fields or just `field_name`.
+    """
+    for key, validator in _plan_validators(entitycls):
+        if isinstance(validator, _OneOf) and field_name in (None, key):
+            validator.refresh()
+
+
+class BatchValidator(object):
+    """
+        Validates all the instances of a class being flushed at once, for checks that would
+        otherwise need a query per instance.  ValidatorBase subclasses add them to
+        batch_validators; validate() is called before flush, after the per instance
+        validation, and adds errors to the instances.
+    """
+    def validate(self, session, entities):
+        raise NotImplementedError
+
+
+class _UniqueBatchValidator(BatchValidator):
+    in_use_msg = 'Value is already in use'
+    duplicate_msg = 'Value is used by another instance being saved'
+
+    def __init__(self, entitycls, field_names, chunk_size):
+        self.entitycls = entitycls
+        self.field_names = field_names
+        self.chunk_size = chunk_size
+
+    def validate(self, session, entities):
+        mapper = self.entitycls.__mapper__
+        states = [(ent, saorm.attributes.instance_state(ent)) for ent in entities]
+        for field_name in self.field_names:
+            self.validate_field(session, mapper, field_name, states)
+
+    @staticmethod
+    def candidates(field_name, states):
+        """
+            Returns the new values, those of new instances and the ones that changed, mapped
+            to the (entity, identity) pairs holding them, and what each persistent instance in
+            the flush will hold once it's done by identity.
+        """
+        candidates = defaultdict(list)
+        flushed_values = {}
+        for ent, state in states:
+            value = getattr(ent, field_name, None)
+            if state.key is not None:
+                flushed_values[state.identity] = value
+                if field_name not in state.committed_state:
+                    continue
+            if value is not None:
+                candidates[value].append((ent, state.identity))
+        return candidates, flushed_values
+
+    def validate_field(self, session, mapper, field_name, states):
+        candidates, flushed_values = self.candidates(field_name, states)
+        if not candidates:
+            return
+
+        # duplicates amongst the instances being flushed, the first one keeps the value
+        for value, holders in six.iteritems(candidates):
+            for ent, _ in holders[1:]:
+                ent._sav.add_error(field_name, self.duplicate_msg)
+
+        self.check_in_use(session, mapper, field_name, candidates, flushed_values)
+
+    def check_in_use(self, session, mapper, field_name, candidates, flushed_values):
+        column = getattr(self.entitycls, field_name)
+        values = list(candidates)
+        with session.no_autoflush:
+            for start in range(0, len(values), self.chunk_size):
+                chunk = values[start:start + self.chunk_size]
+                query = session.query(column, *mapper.primary_key).filter(column.in_(chunk))
+                for row in query:
+                    value, identity = row[0], tuple(row[1:])
+                    # the row's value is being changed by this flush, e.g. swapped values.
+                    # Rows being deleted still count, SA deletes after inserting and updating.
+                    if identity in flushed_values and flushed_values[identity] != value:
+                        continue
+                    for ent, ent_identity in candidates.get(value, ()):
+                        if ent_identity != identity:
+                            ent._sav.add_error(field_name, self.in_use_msg)
+
+
+_monotonic = getattr(time, 'monotonic', time.time)
+
+# the keys each session found in its transaction, by _ReferenceCache.  Other sessions must not
+# see rows that may be rolled back, so they are only cached once the transaction commits.
+_uncommitted_keys = weakref.WeakKeyDictionary()
+
+
+def _in_nested_transaction(session):
+    if hasattr(session, 'in_nested_transaction'):
+        return session.in_nested_transaction()
+    # SQLAlchemy < 1.4
+    return session.transaction.nested
+
+
+def _cache_committed_keys(session):
+    # releasing a savepoint commits too, the keys wait for the outermost transaction
+    if _in_nested_transaction(session):
+        return
+    for cache, keys in six.iteritems(_uncommitted_keys.pop(session, {})):
+        cache.add(keys)
+
+
+def _discard_uncommitted_keys(session, previous_transaction):
+    _uncommitted_keys.pop(session, None)
+
+
+sa.event.listen(saorm.Session, 'after_commit', _cache_committed_keys)
+sa.event.listen(saorm.Session, 'after_soft_rollback', _discard_uncommitted_keys)
+
+
+class _ReferenceCache(object):
+    """ a bounded LRU set of the referenced keys known to exist, each kept for ttl seconds """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._expires = OrderedDict()
+        self._lock = threading.Lock()
+
+    def known(self, session, key):
+        """ True when `key` was found by `session` earlier in its transaction or is cached """
+        uncommitted = _uncommitted_keys.get(session)
+        with self._lock:
+            if uncommitted and key in uncommitted.get(self, ()):
+                self.hits += 1
+                return True
+            expires = self._expires.pop(key, None)
+            if expires is None or expires < _monotonic():
+                self.misses += 1
+                return False
+            self._expires[key] = expires
+            self.hits += 1
+            return True
+
+    def add_uncommitted(self, session, keys):
+        """ keeps keys found by `session` until its transaction commits """
+        _uncommitted_keys.setdefault(session, {}).setdefault(self, set()).update(keys)
+
+    def add(self, keys):
+        expires = _monotonic() + self.ttl
+        with self._lock:
+            for key in keys:
+                self._expires.pop(key, None)
+                self._expires[key] = expires
+            while len(self._expires) > self.maxsize:
+                self._expires.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._expires.clear()
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._expires))
+
+
+class _ReferenceBatchValidator(BatchValidator):
+    missing_msg = 'The referenced record does not exist'
+
+    def __init__(self, entitycls, field_name, target, chunk_size, cache):
+        self.entitycls = entitycls
+        self.field_name = field_name
+        # the column the foreign key references
+        self.target = target
+        self.chunk_size = chunk_size
+        self.cache = cache
+
+    def pending_keys(self, session):
+        """ the keys of the target table's rows this flush is inserting and deleting """
+        inserted, deleted = set(), set()
+        for keys, objs in ((inserted, session.new), (deleted, session.deleted)):
+            for obj in objs:
+                mapper = saorm.object_mapper(obj)
+                if self.target.table not in mapper.tables:
+                    continue
+                # parents with their key assigned by the application, not the database
+                value = getattr(obj, mapper.get_property_by_column(self.target).key, None)
+                if value is not None:
+                    keys.add(value)
+        return inserted, deleted
+
+    def candidates(self, entities):
+        """ maps the values of new instances and the ones that changed to their entities """
+        field_name = self.field_name
+        candidates = defaultdict(list)
+        for ent in entities:
+            state = saorm.attributes.instance_state(ent)
+            if state.key is not None and field_name not in state.committed_state:
+                continue
+            value = getattr(ent, field_name, None)
+            if value is not None:
+                candidates[value].append(ent)
+        return candidates
+
+    def query_missing(self, session, values):
+        """ returns the set of `values` the target table doesn't have, in chunked queries """
+        missing = set()
+        with session.no_autoflush:
+            for start in range(0, len(values), self.chunk_size):
+                chunk = values[start:start + self.chunk_size]
+                found = set(
+                    row[0] for row in session.query(self.target).filter(self.target.in_(chunk))
+                )
+                if self.cache is not None:
+                    self.cache.add_uncommitted(session, found)
+                missing.update(value for value in chunk if value not in found)
+        return missing
+
+    def validate(self, session, entities):
+        field_name = self.field_name
+        candidates = self.candidates(entities)
+        if not candidates:
+            return
+
+        inserted, deleted = self.pending_keys(session)
+        missing = set()
+        to_query = []
+        for value in candidates:
+            if value in deleted:
+                missing.add(value)
+            elif value in inserted:
+                continue
+            elif self.cache is None or not self.cache.known(session, value):
+                to_query.append(value)
+        missing.update(self.query_missing(session, to_query))
+
+        for value in missing:
+            for ent in candidates[value]:
+                ent._sav.add_error(field_name, self.missing_msg)
+
+
+class _ValidatesUnique(ValidatorBase):
+    """
+        Checks columns which need to be unique before flush, with one query per column for
+        all the instances flushed (in chunks of chunk_size values), instead of waiting for the
+        IntegrityError.  Each column is unique on its own.
+    """
+    def create_fe_validators(self):
+        chunk_size = self.kwargs.get('chunk_size', 500)
+        self.batch_validators.append(
+            _UniqueBatchValidator(self.entitycls, tuple(self.field_names), chunk_size)
+        )
+
+
+class _ValidatesReferences(ValidatorBase):
+    """
+        Checks that the values of foreign key columns exist in the referenced table before
+        flush, with IN queries of chunk_size keys per referenced column for all the instances
+        flushed.  With no column names, all the class's single column foreign keys are checked.
+
+        Parents inserted by the same flush with their key set count as existing.  Keys found
+        to exist can be cached for cache_ttl seconds, keeping up to cache_size keys, which
+        helps for reference tables rows aren't deleted from.  Keys are only cached for other
+        sessions once the transaction that found them commits.
+    """
+    def create_fe_validators(self):
+        chunk_size = self.kwargs.get('chunk_size', 500)
+        cache_size = self.kwargs.get('cache_size', 0)
+        cache_ttl = self.kwargs.get('cache_ttl', 60)
+        metadata = self.entitycls._sav_class_metadata()
+        field_names = self.field_names or [
+            colname for colname in metadata.column_names if metadata.columns[colname].foreign_keys
+        ]
+        for colname in field_names:
+            column = self.fetch_sa_column(colname)
+            if len(column.foreign_keys) != 1:
+                raise ValueError('validates_references() needs a column with one foreign key,'
+                                 ' {0} has {1}'.format(colname, len(column.foreign_keys)))
+            target = list(column.foreign_keys)[0].column
+            cache = _ReferenceCache(cache_size, cache_ttl) if cache_size else None
+            self.batch_validators.append(
+                _ReferenceBatchValidator(self.entitycls, colname, target, chunk_size, cache)
+            )
+
+
+def reference_cache_info(entitycls):
+    """ returns a dict mapping the foreign key columns checked with a cache to its CacheInfo """
+    return dict(
+        (bv.field_name, bv.cache.info()) for bv in entitycls._sav_batch_validators
+        if isinstance(bv, _ReferenceBatchValidator) and bv.cache is not None
+    )
+
+
+def clear_reference_caches(entitycls):
+    for bv in entitycls._sav_batch_validators:
+        if isinstance(bv, _ReferenceBatchValidator) and bv.cache is not None:
+            bv.cache.clear()
+
+
 @entity_linker
 class _ValidatesConstraints(ValidatorBase):
     def create_fe_validators(self):
@@ -260,41 +798,46 @@ class _ValidatesConstraints(ValidatorBase):
         validate_nullable = bool(self.kwargs.get('nullable', True))
         validate_type = bool(self.kwargs.get('type', True))
         excludes = self.kwargs.get('exclude', [])
+        type_mapping = tuple(six.iteritems(SA_FORMENCODE_MAPPING))
 
-        for colname in self.entitycls._sav_column_names():
+        metadata = self.entitycls._sav_class_metadata()
+        for colname in metadata.column_names:
             # get the SA column instance
-            col = self.entitycls.__mapper__.get_property(colname).columns[0]
+            info = metadata.columns[colname]
+            col = info.column
 
             # ignore primary keys
-            if colname in excludes or col.primary_key:
+            if colname in excludes or info.primary_key:
                 continue
 
             # validate lengths on String and Unicode types, but not Text b/c it shouldn't have a
             # length
             if validate_length and isinstance(col.type, sa.types.String) \
                     and not isinstance(col.type, sa.types.Text):
-                fmeta = FEVMeta(fev.MaxLength(col.type.length), colname)
+                fmeta = FEVMeta(interned_validator(fev.MaxLength, col.type.length), colname)
                 self.fev_metas.append(fmeta)
 
             if validate_type and isinstance(col.type, sa.types.Numeric):
-                fmeta = FEVMeta(NumericValidator(col.type.precision, col.type.scale), colname)
+                validator = interned_validator(NumericValidator, col.type.precision,
+                                               col.type.scale)
+                fmeta = FEVMeta(validator, colname)
                 self.fev_metas.append(fmeta)
 
             # handle fields that are not nullable
-            if validate_nullable and not col.nullable:
-                if not col.default and not col.server_default:
-                    validator = formencode.FancyValidator(not_empty=True)
+            if validate_nullable and not info.nullable:
+                if not info.has_default:
+                    validator = interned_validator(formencode.FancyValidator, not_empty=True)
                     event = 'before_flush'
-                    if col.foreign_keys:
+                    if info.foreign_keys:
                         event = 'before_exec'
                     fmeta = FEVMeta(validator, colname, event)
                     self.fev_metas.append(fmeta)
 
             # data-type validation
             if validate_type:
-                for sa_type, fe_validator in six.iteritems(SA_FORMENCODE_MAPPING):
+                for sa_type, fe_validator in type_mapping:
                     if isinstance(col.type, sa_type):
-                        self.create_fev_meta(fe_validator, colname, auto_not_empty=False)
+                        self.fev_metas.append(FEVMeta(interned_validator(fe_validator), colname))
                         break
 
 
@@ -316,17 +859,29 @@ def formencode_factory(fevalidator, **kwargs):
     return EntityLinker(_ValidatesFeValidator)
 
 
+class _ValidatesUSPhone(ValidatorBase):
+    type = 'field'
+
+    @property
+    def fe_validator(self):
+        # only imported once the validator is used
+        import formencode.national
+        return formencode.national.USPhoneNumber
+
+
 validates_choices = EntityLinker(_ValidatesChoices)
 validates_constraints = _ValidatesConstraints
 validates_ipaddr = EntityLinker(_ValidatesIPAddress)
 validates_minlen = EntityLinker(_ValidatesMinLength)
 validates_one_of = EntityLinker(_ValidatesOneOf)
 validates_presence_of = _ValidatesPresenceOf
+validates_references = EntityLinker(_ValidatesReferences)
+validates_unique = EntityLinker(_ValidatesUnique)
 validates_required = _ValidatesPresenceOf
 validates_url = EntityLinker(_ValidatesURL)
 validates_email = formencode_factory(fev.Email)
-validates_usphone = formencode_factory(formencode.national.USPhoneNumber)
+validates_usphone = EntityLinker(_ValidatesUSPhone)
 
-converts_date = formencode_factory(fev.DateConverter, sv_convert=True)
-converts_time = formencode_factory(fev.TimeConverter, use_datetime=True, sv_convert=True)
+converts_date = formencode_factory(DateConverter, sv_convert=True)
+converts_time = formencode_factory(TimeConverter, use_datetime=True, sv_convert=True)
 converts_datetime = formencode_factory(DateTimeConverter, sv_convert=True)